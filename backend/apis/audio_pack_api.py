@@ -0,0 +1,314 @@
+# backend/apis/audio_pack_api.py
+import asyncio
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Request
+from fastapi.responses import FileResponse, PlainTextResponse
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models import AudioPackItem, Course, Flashcard, Summary
+from services import jobs, speech, tts_cache
+
+# Offline audio packs: AUDIO_PACK_DIR/<course_id>/<item_key>.mp3 plus pack.zip
+AUDIO_PACK_DIR = os.getenv("AUDIO_PACK_DIR") or os.path.join(tempfile.gettempdir(), "studypal-audio-packs")
+# Items synthesized at once per pack (each long summary also pipelines its segments)
+AUDIO_PACK_CONCURRENCY = int(os.getenv("AUDIO_PACK_CONCURRENCY", "4"))
+
+_ZIP_NAME = "pack.zip"
+_LENGTH_ORDER = ("short", "medium", "long")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_MARKUP = re.compile(r"[#*_`>]+")
+
+_SESSION_FACTORY: Optional[Callable[[], Session]] = None
+def set_session_factory_for_audio_pack(factory: Callable[[], Session]) -> None:
+    global _SESSION_FACTORY
+    _SESSION_FACTORY = factory
+
+def _fail(msg: str) -> dict:
+    return {"status": "FAIL", "statusCode": 200, "message": msg, "data": ""}
+
+def _success(data_str: str, message: str = "") -> dict:
+    return {"status": "SUCCESS", "statusCode": 200, "message": message, "data": data_str}
+
+def _course_dir(course_id: int) -> str:
+    return os.path.join(AUDIO_PACK_DIR, str(course_id))
+
+def _speakable(markdown: str) -> str:
+    """Summary text without markdown markup, which TTS would read out."""
+    return _MARKUP.sub("", _LINK.sub(r"\1", markdown)).strip()
+
+
+# ---------------- POST /courses/{course_id}/audio-pack ----------------
+async def create_audio_pack(course_id: int, background: bool = Query(True)):
+    """
+    Synthesize audio for every flashcard side and stored summary of the course.
+    Runs as a background job (poll GET /jobs/{job_id}); items whose text did not
+    change since the last pack are kept as they are.
+    """
+    if _SESSION_FACTORY is None:
+        return _fail("Server misconfigured: no DB session factory is set.")
+    if not speech.ELEVEN_KEY:
+        return _fail("ElevenLabs API key missing on server.")
+    return await jobs.run_job("audio_pack", course_id, {"course_id": course_id}, background)
+
+def _pack_items(course_id: int) -> Optional[List[dict]]:
+    """The texts the pack should contain, in playlist order; None when the course does not exist."""
+    with _SESSION_FACTORY() as db:
+        if db.get(Course, course_id) is None:
+            return None
+        summaries = db.execute(
+            select(Summary.summary_length, Summary.summary_content).where(Summary.course_id == course_id)
+        ).all()
+        cards = db.execute(
+            select(Flashcard.card_index, Flashcard.front_text, Flashcard.back_text)
+            .where(Flashcard.course_id == course_id)
+            .order_by(Flashcard.card_index.asc())
+        ).all()
+
+    items = []
+    summaries = sorted(summaries, key=lambda r: _LENGTH_ORDER.index(r[0]) if r[0] in _LENGTH_ORDER else len(_LENGTH_ORDER))
+    for length, content in summaries:
+        items.append({"item_key": f"summary-{length}", "title": f"Summary ({length})", "text": _speakable(content)})
+    for idx, front, back in cards:
+        items.append({"item_key": f"flashcard-{idx:02d}-front", "title": f"Flashcard {idx} (front)", "text": front})
+        items.append({"item_key": f"flashcard-{idx:02d}-back", "title": f"Flashcard {idx} (back)", "text": back})
+    items = [it for it in items if it["text"].strip()]
+    for position, it in enumerate(items):
+        it["position"] = position
+        it["text_hash"] = tts_cache.cache_key(it["text"].strip(), speech.DEFAULT_VOICE_ID, speech.DEFAULT_MODEL_ID,
+                                              speech.DEFAULT_OUTPUT_FORMAT)
+        it["file_name"] = f"{it['item_key']}.mp3"
+    return items
+
+def _existing(course_id: int) -> Dict[str, Tuple[str, int]]:
+    """item_key -> (text_hash, position) of the current pack."""
+    with _SESSION_FACTORY() as db:
+        rows = db.execute(
+            select(AudioPackItem.item_key, AudioPackItem.text_hash, AudioPackItem.position)
+            .where(AudioPackItem.course_id == course_id)
+        ).all()
+    return {k: (h, p) for k, h, p in rows}
+
+def _render(course_id: int, item: dict) -> int:
+    """Write one item's audio file; audio already in the TTS cache is copied instead of synthesized."""
+    folder = _course_dir(course_id)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".part")
+    try:
+        cached = tts_cache.get_path(item["text_hash"])
+        with os.fdopen(fd, "wb") as out:
+            if cached is not None:
+                with open(cached[0], "rb") as f:
+                    shutil.copyfileobj(f, out)
+            else:
+                # through the TTS cache, so /tts plays this text instantly afterwards
+                for chunk in tts_cache.tee(item["text_hash"], speech.DEFAULT_OUTPUT_FORMAT,
+                                           speech.synthesize(item["text"].strip())):
+                    out.write(chunk)
+        os.replace(tmp, os.path.join(folder, item["file_name"]))
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return os.path.getsize(os.path.join(folder, item["file_name"]))
+
+def _sync_manifest(course_id: int, items: List[dict], rendered: Dict[str, int]) -> None:
+    keys = [it["item_key"] for it in items]
+    with _SESSION_FACTORY() as db:
+        stale = db.execute(
+            select(AudioPackItem.file_name)
+            .where(AudioPackItem.course_id == course_id, AudioPackItem.item_key.not_in(keys))
+        ).scalars().all()
+        db.execute(delete(AudioPackItem).where(AudioPackItem.course_id == course_id,
+                                               AudioPackItem.item_key.not_in(keys)))
+        for it in items:
+            if it["item_key"] in rendered:
+                stmt = pg_insert(AudioPackItem).values(
+                    course_id=course_id, item_key=it["item_key"], position=it["position"], title=it["title"],
+                    text_hash=it["text_hash"], file_name=it["file_name"], byte_size=rendered[it["item_key"]],
+                )
+                db.execute(stmt.on_conflict_do_update(
+                    index_elements=["course_id", "item_key"],
+                    set_={"position": stmt.excluded.position, "title": stmt.excluded.title,
+                          "text_hash": stmt.excluded.text_hash, "file_name": stmt.excluded.file_name,
+                          "byte_size": stmt.excluded.byte_size},
+                ))
+            else:
+                # unchanged audio; an item added or removed before it may have moved it
+                db.execute(
+                    update(AudioPackItem)
+                    .where(AudioPackItem.course_id == course_id, AudioPackItem.item_key == it["item_key"])
+                    .values(position=it["position"], title=it["title"])
+                )
+        db.commit()
+    for name in stale:
+        try:
+            os.remove(os.path.join(_course_dir(course_id), name))
+        except OSError:
+            pass
+
+def _manifest(course_id: int) -> List[Tuple[str, str, int]]:
+    """(title, file_name, byte_size) of the pack's files in playlist order."""
+    with _SESSION_FACTORY() as db:
+        return [tuple(r) for r in db.execute(
+            select(AudioPackItem.title, AudioPackItem.file_name, AudioPackItem.byte_size)
+            .where(AudioPackItem.course_id == course_id)
+            .order_by(AudioPackItem.position.asc())
+        ).all()]
+
+def _on_disk(course_id: int, manifest: List[Tuple[str, str, int]]) -> Tuple[list, List[str]]:
+    """Split manifest entries into those whose file exists and the file names that are missing."""
+    folder = _course_dir(course_id)
+    present, missing = [], []
+    for entry in manifest:
+        if os.path.exists(os.path.join(folder, entry[1])):
+            present.append(entry)
+        else:
+            missing.append(entry[1])
+    return present, missing
+
+def _playlist(entries: List[Tuple[str, str]]) -> str:
+    lines = ["#EXTM3U"]
+    for title, location in entries:
+        lines += [f"#EXTINF:-1,{title}", location]
+    return "\n".join(lines) + "\n"
+
+def _build_zip(course_id: int) -> None:
+    folder = _course_dir(course_id)
+    manifest, missing = _on_disk(course_id, _manifest(course_id))
+    if missing:
+        print(f"Audio pack of course {course_id}: leaving missing file(s) out of the zip:", ", ".join(missing))
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".part")
+    os.close(fd)
+    try:
+        # mp3 does not compress: store
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_STORED) as zf:
+            for title, name, _ in manifest:
+                zf.write(os.path.join(folder, name), arcname=name)
+            zf.writestr("playlist.m3u", _playlist([(title, name) for title, name, _ in manifest]))
+        os.replace(tmp, os.path.join(folder, _ZIP_NAME))
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+async def _audio_pack_job(params: dict) -> dict:
+    course_id = params["course_id"]
+    items = await run_in_threadpool(_pack_items, course_id)
+    if items is None:
+        return _fail(f"Course id={course_id} not found")
+    if not items:
+        return _fail(f"Course id={course_id} has no flashcards or summaries yet")
+
+    existing = await run_in_threadpool(_existing, course_id)
+    folder = _course_dir(course_id)
+    todo = [
+        it for it in items
+        if existing.get(it["item_key"], ("",))[0] != it["text_hash"]
+        or not os.path.exists(os.path.join(folder, it["file_name"]))
+    ]
+
+    sem = asyncio.Semaphore(AUDIO_PACK_CONCURRENCY)
+
+    async def render(item: dict) -> int:
+        async with sem:
+            return await run_in_threadpool(_render, course_id, item)
+
+    results = await asyncio.gather(*(render(it) for it in todo), return_exceptions=True)
+    rendered: Dict[str, int] = {}
+    failed = []
+    for it, res in zip(todo, results):
+        if isinstance(res, BaseException):
+            print(f"Audio pack item {it['item_key']} of course {course_id} failed:", res)
+            failed.append(it["item_key"])
+        else:
+            rendered[it["item_key"]] = res
+
+    # a failed item's old file (if any) is missing or holds outdated text: leave the item
+    # out of the pack (its row and file are removed) and retry it on the next run
+    ok_items = [it for it in items if it["item_key"] not in failed]
+    await run_in_threadpool(_sync_manifest, course_id, ok_items, rendered)
+    changed = bool(rendered) or {it["item_key"] for it in ok_items} != set(existing) or any(
+        existing[it["item_key"]][1] != it["position"] for it in ok_items if it["item_key"] in existing
+    )
+    if changed or not os.path.exists(os.path.join(folder, _ZIP_NAME)):
+        await run_in_threadpool(_build_zip, course_id)
+    if todo and not rendered:
+        return _fail(f"Audio synthesis failed for all {len(todo)} item(s)")
+
+    payload = {
+        "course_id": course_id,
+        "items": len(ok_items),
+        "synthesized": len(rendered),
+        "unchanged": len(items) - len(todo),
+        "failed": failed,
+    }
+    return _success(json.dumps(payload), f"Audio pack ready for course_id={course_id}.")
+
+jobs.register("audio_pack", _audio_pack_job)
+
+
+# ---------------- GET /courses/{course_id}/audio-pack ----------------
+def get_audio_pack(course_id: int, request: Request,
+                   fmt: str = Query("json", alias="format", description="json | zip | m3u")):
+    """
+    The course's audio pack: a JSON listing, the whole pack as one .zip
+    (with playlist.m3u inside), or an .m3u playlist of the files' URLs.
+    """
+    if _SESSION_FACTORY is None:
+        return _fail("Server misconfigured: no DB session factory is set.")
+    manifest, missing = _on_disk(course_id, _manifest(course_id))
+    if not manifest:
+        return _fail(f"No audio pack for course_id={course_id}. POST /courses/{course_id}/audio-pack to create one.")
+
+    fmt = (fmt or "").strip().lower()
+    if fmt == "zip":
+        path = os.path.join(_course_dir(course_id), _ZIP_NAME)
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="Audio pack archive missing. Create the pack again.")
+        return FileResponse(path, media_type="application/zip", filename=f"course-{course_id}-audio.zip")
+    base = str(request.base_url).rstrip("/")
+    if fmt == "m3u":
+        return PlainTextResponse(
+            _playlist([(title, f"{base}/courses/{course_id}/audio-pack/files/{name}") for title, name, _ in manifest]),
+            media_type="audio/x-mpegurl",
+            headers={"Content-Disposition": f'attachment; filename="course-{course_id}-audio.m3u"'},
+        )
+    if fmt != "json":
+        return _fail("Invalid format. Use one of: json, zip, m3u.")
+    items = [
+        {"title": title, "file_name": name, "byte_size": size,
+         "url": f"{base}/courses/{course_id}/audio-pack/files/{name}"}
+        for title, name, size in manifest
+    ]
+    message = f"Audio pack of course_id={course_id} has {len(items)} file(s)."
+    if missing:
+        message += f" {len(missing)} file(s) are missing; POST /courses/{course_id}/audio-pack to restore them."
+    return _success(json.dumps({"course_id": course_id, "items": items, "missing": missing}), message)
+
+# ---------------- GET /courses/{course_id}/audio-pack/files/{file_name} ----------------
+def get_audio_pack_file(course_id: int, file_name: str):
+    if _SESSION_FACTORY is None:
+        return _fail("Server misconfigured: no DB session factory is set.")
+    with _SESSION_FACTORY() as db:
+        known = db.execute(
+            select(AudioPackItem.item_id)
+            .where(AudioPackItem.course_id == course_id, AudioPackItem.file_name == file_name)
+        ).scalar_one_or_none()
+    path = os.path.join(_course_dir(course_id), file_name)
+    if known is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Audio file not found.")
+    return FileResponse(path, media_type="audio/mpeg")
@@ -3,12 +3,19 @@ import os
 import json
 from typing import Callable, List, Optional
 
-from fastapi import Body
+from fastapi import Query
 from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from models import Course, Flashcard
-from openai import OpenAI
+from services.course_chunks import course_context
+from services.llm_cache import cached_call
+from services.llm_clients import openai_client
+from services import jobs
+
+# Prompt budget (approx. tokens) of course material sent for flashcards
+FLASHCARD_CONTEXT_TOKENS = int(os.getenv("FLASHCARD_CONTEXT_TOKENS", "2000"))
 
 _SESSION_FACTORY: Optional[Callable[[], Session]] = None
 
@@ -22,14 +29,27 @@ def _fail(msg: str) -> dict:
 def _success(data_str: str, message: str = "") -> dict:
     return {"status": "SUCCESS", "statusCode": 200, "message": message, "data": data_str}
 
-def _get_openai_client() -> OpenAI:
-    key = os.getenv("OPENAI_API_KEY", "").strip()
-    if not key:
-        raise RuntimeError("Missing OPENAI_API_KEY")
-    return OpenAI(api_key=key)
+def _parse_cards(raw: str) -> list:
+    try:
+        data = json.loads(raw)
+        if not isinstance(data, list):
+            raise ValueError("not a list")
+    except Exception:
+        start = raw.find("["); end = raw.rfind("]")
+        if start != -1 and end != -1 and end > start:
+            data = json.loads(raw[start:end+1])
+        else:
+            raise ValueError("Model did not return JSON")
+    return data
+
+def _is_card_json(raw: str) -> bool:
+    try:
+        _parse_cards(raw)
+        return True
+    except Exception:
+        return False
 
-def _generate_flashcards_from_text(text: str, n: int = 10) -> List[dict]:
-    client = _get_openai_client()
+def _generate_flashcards_from_text(text: str, n: int = 10, refresh: bool = False) -> List[dict]:
     system = (
         "You create educational flashcards. "
         "Keep language simple and clear. Each card has a concise front (prompt) and a helpful back (answer)."
@@ -43,19 +63,15 @@ def _generate_flashcards_from_text(text: str, n: int = 10) -> List[dict]:
         "</content>"
     ).replace("{n}", str(n))
 
-    resp = client.responses.create(model="gpt-4o-mini", input=f"{system}\n\n{user}", temperature=0.2)
-    raw = getattr(resp, "output_text", None) or str(resp)
+    prompt = f"{system}\n\n{user}"
 
-    try:
-        data = json.loads(raw)
-        if not isinstance(data, list):
-            raise ValueError("not a list")
-    except Exception:
-        start = raw.find("["); end = raw.rfind("]")
-        if start != -1 and end != -1 and end > start:
-            data = json.loads(raw[start:end+1])
-        else:
-            raise ValueError("Model did not return JSON")
+    def _call() -> str:
+        resp = openai_client().responses.create(model="gpt-4o-mini", input=prompt, temperature=0.2)
+        return getattr(resp, "output_text", None) or str(resp)
+
+    raw = cached_call("openai", "gpt-4o-mini", prompt, {"temperature": 0.2}, _call,
+                      refresh=refresh, accept=_is_card_json)
+    data = _parse_cards(raw)
 
     cards: List[dict] = []
     for item in data:
@@ -73,41 +89,56 @@ def _generate_flashcards_from_text(text: str, n: int = 10) -> List[dict]:
         cards = cards[:n]
     return cards
 
-def create_or_replace_flashcards(course_id: int):
+async def create_or_replace_flashcards(course_id: int, regenerate: bool = Query(False),
+                                      background: bool = Query(False)):
+    """Runs as a background job; ?background=true returns the job id instead of waiting."""
     if _SESSION_FACTORY is None:
         return _fail("Server misconfigured: no DB session factory is set.")
+    params = {"course_id": course_id, "regenerate": regenerate}
+    return await jobs.run_job("flashcards", course_id, params, background)
+
+def _flashcards_job(params: dict) -> dict:
+    course_id = params["course_id"]
 
     # fetch only needed columns (avoid non-existent fields)
     with _SESSION_FACTORY() as db:
-        row = db.execute(
-            select(Course.course_id, Course.course_name, Course.course_content)
-            .where(Course.course_id == course_id)
-        ).one_or_none()
-        if not row:
+        exists = db.execute(
+            select(Course.course_id).where(Course.course_id == course_id)
+        ).scalar_one_or_none()
+        if exists is None:
             return _fail(f"Course id={course_id} not found")
 
-        _, _, content = row
-        content = (content or "").strip()
+        # bounded prompt: chunks from across the whole course
+        content = course_context(db, course_id, "", FLASHCARD_CONTEXT_TOKENS, spread=True)
         if not content:
             return _fail(f"Course id={course_id} has no content")
 
     try:
-        cards = _generate_flashcards_from_text(content, n=10)
+        cards = _generate_flashcards_from_text(content, n=10, refresh=params.get("regenerate", False))
     except RuntimeError as e:
         return _fail(str(e))
     except Exception as e:
         return _fail(f"AI call failed: {type(e).__name__}")
 
+    # one transaction, two statements: a multi-row upsert by (course_id, card_index) - concurrent
+    # writers never trip uq_course_card_slot - and the delete of slots beyond the new deck
     with _SESSION_FACTORY() as db:
-        db.execute(delete(Flashcard).where(Flashcard.course_id == course_id))
-        for idx, card in enumerate(cards, start=1):
-            db.add(Flashcard(course_id=course_id, card_index=idx,
-                             front_text=card["front"], back_text=card["back"]))
+        stmt = pg_insert(Flashcard).values([
+            {"course_id": course_id, "card_index": idx, "front_text": card["front"], "back_text": card["back"]}
+            for idx, card in enumerate(cards, start=1)
+        ])
+        saved = db.execute(stmt.on_conflict_do_update(
+            index_elements=["course_id", "card_index"],
+            set_={"front_text": stmt.excluded.front_text, "back_text": stmt.excluded.back_text},
+        ).returning(Flashcard.flashcard_id)).all()
+        db.execute(delete(Flashcard).where(Flashcard.course_id == course_id, Flashcard.card_index > len(cards)))
         db.commit()
 
-    return _success(f"Inserted 10 flashcards for course_id={course_id}",
+    return _success(f"Inserted {len(saved)} flashcards for course_id={course_id}",
                     message="Flashcards generated and replaced successfully.")
 
+jobs.register("flashcards", _flashcards_job)
+
 
 # ---------------- GET: /courses/{course_id}/flashcards ----------------
 def get_flashcards(course_id: int):
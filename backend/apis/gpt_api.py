@@ -1,24 +1,26 @@
-import os
 import json
-import pathlib
-from tempfile import NamedTemporaryFile
+from contextlib import aclosing
 from typing import Callable, List, Optional
 
 from dotenv import load_dotenv
-from fastapi import HTTPException, UploadFile, File, Form, Body
-from sqlalchemy import select, func, delete
+from fastapi import Body
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-
-# File parsers
-import pdfplumber
-from docx import Document as DocxDocument
-from pptx import Presentation
+from starlette.concurrency import run_in_threadpool
 
 # DB models
-from models import Course, Summary
+from models import Course, CourseChunk, Summary
 from fastapi import Query
 
-from openai import OpenAI
+from services.extraction import extract_uploads
+from services.uploads import receive_uploads
+from services.summarizer import build_material, stream_summary, summarize_course
+from services import jobs
+from services.sse import SSE_HEADERS, sse_event as _sse
+from services.course_chunks import (
+    combine_files, ensure_chunks, load_course_text, store_course, text_units,
+)
 
 load_dotenv()
 
@@ -35,70 +37,6 @@ def _fail(msg: str) -> dict:
 def _success(data_str: str, message: str = "") -> dict:
     return {"status": "SUCCESS", "statusCode": 200, "message": message, "data": data_str}
 
-# --- File extraction helpers ---
-MAX_BYTES = 50 * 1024 * 1024  # 50 MB
-
-def _read_pdf(path: str) -> str:
-    parts: List[str] = []
-    with pdfplumber.open(path) as pdf:
-        for p in pdf.pages:
-            parts.append(p.extract_text() or "")
-    return "\n".join(parts).strip()
-
-def _read_docx(path: str) -> str:
-    doc = DocxDocument(path)
-    return "\n".join(p.text for p in doc.paragraphs).strip()
-
-def _read_pptx(path: str) -> str:
-    prs = Presentation(path)
-    parts: List[str] = []
-    for slide in prs.slides:
-        for shape in slide.shapes:
-            if hasattr(shape, "text"):
-                parts.append(shape.text)
-    return "\n".join(parts).strip()
-
-def _extract_text_from_upload(upload: UploadFile) -> str:
-    name = upload.filename or "uploaded"
-    _, ext = os.path.splitext(name.lower())
-
-    upload.file.seek(0, os.SEEK_END)
-    size = upload.file.tell()
-    upload.file.seek(0)
-    if size > MAX_BYTES:
-        raise HTTPException(status_code=413, detail=f"{name} exceeds {MAX_BYTES // (1024*1024)}MB limit")
-
-    with NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-        tmp.write(upload.file.read())
-        tmp_path = tmp.name
-
-    try:
-        if ext == ".pdf":
-            text = _read_pdf(tmp_path)
-        elif ext == ".docx":
-            text = _read_docx(tmp_path)
-        elif ext == ".pptx":
-            text = _read_pptx(tmp_path)
-        else:
-            raise HTTPException(status_code=415, detail=f"Unsupported file type '{ext}'. Use PDF, DOCX, or PPTX.")
-    finally:
-        try:
-            os.remove(tmp_path)
-        except Exception:
-            pass
-
-    if not text:
-        raise HTTPException(status_code=400, detail=f"No readable text found in {name}. If it is a scanned PDF, add OCR.")
-    return text
-
-def _extract_many(uploads: List[UploadFile]) -> List[tuple[str, str]]:
-    out: List[tuple[str, str]] = []
-    for up in uploads:
-        text = _extract_text_from_upload(up)
-        stem = pathlib.Path(up.filename or "uploaded").stem
-        out.append((stem, text))
-    return out
-
 def _derive_course_name(stems: List[str], override: Optional[str]) -> str:
     if override:
         return override[:255]
@@ -112,15 +50,15 @@ def _derive_course_name(stems: List[str], override: Optional[str]) -> str:
 
 # --- POST /addcourse ---
 # gpt_api.py
-from fastapi import Request, File, Form, UploadFile
+from fastapi import Request
+from fastapi.responses import StreamingResponse
 
 # POST /addcourse
-async def ingest_and_store_endpoint(
-    request: Request,
-    files: Optional[List[UploadFile]] = File(None, description="One or more PDF/DOCX/PPTX files"),
-    course_name: Optional[str] = Form(None, description="Course name"),
-    user_id: Optional[int] = Form(None, description="User ID of uploader"),
-):
+async def ingest_and_store_endpoint(request: Request):
+    """
+    multipart/form-data: files=<PDF/DOCX/PPTX> (repeatable), course_name, user_id.
+    Files are streamed to disk as they arrive (services/uploads.py), not buffered.
+    """
     if _SESSION_FACTORY is None:
         return _fail("Server misconfigured: no DB session factory is set.")
 
@@ -128,33 +66,29 @@ async def ingest_and_store_endpoint(
 
     # ---- Branch 1: multipart/form-data (file uploads) ----
     if ct.startswith("multipart/form-data"):
-        # If FastAPI didn't bind files, recover them from the raw form:
-        if not files:
-            form = await request.form()
-            files = [v for k, v in form.multi_items() if k == "files" and isinstance(v, UploadFile)]
-            course_name = course_name or form.get("course_name")
-            raw_uid = user_id if user_id is not None else form.get("user_id")
+        async with receive_uploads(request) as (form, uploads):
+            files = [u for u in uploads if u.field == "files"]
+            course_name = form.get("course_name")
+            raw_uid = form.get("user_id")
             try:
                 user_id = int(raw_uid) if raw_uid not in (None, "", "null") else None
             except Exception:
                 user_id = None
 
-        if not files:
-            return _fail("No files found under key 'files'. Ensure form-data and key name 'files' for each file.")
+            if not files:
+                return _fail("No files found under key 'files'. Ensure form-data and key name 'files' for each file.")
 
-        extracted = _extract_many(files)  # -> List[(stem, text)]
-        stems = [s for s, _ in extracted]
-        combined_content = "\n\n".join([f"=== FILE: {s} ===\n{t}" for s, t in extracted]).strip()
+            extracted = await extract_uploads(files)  # -> List[ExtractedFile(stem, unit_type, parts)]
+
+        stems = [f.stem for f in extracted]
+        combined_content, units = combine_files(extracted)
         if not combined_content:
             return _fail("No readable text found in uploaded files.")
 
         final_name = _derive_course_name(stems, course_name)
 
         with _SESSION_FACTORY() as db:
-            row = Course(course_name=final_name, course_content=combined_content, user_id=user_id)
-            db.add(row)
-            db.flush()
-            new_id = row.course_id
+            new_id = store_course(db, final_name, user_id, combined_content, units)
             db.commit()
 
         return _success(
@@ -182,10 +116,7 @@ async def ingest_and_store_endpoint(
             uid = None
 
         with _SESSION_FACTORY() as db:
-            row = Course(course_name=cname, course_content=content, user_id=uid)
-            db.add(row)
-            db.flush()
-            new_id = row.course_id
+            new_id = store_course(db, cname, uid, content, text_units(content))
             db.commit()
 
         return _success(f"Saved 1 course(s): {cname}=>id={new_id}", "Stored raw text into courses table.")
@@ -196,12 +127,24 @@ async def ingest_and_store_endpoint(
 
 # --- GET /courses ---
 
+def _escape_like(text: str) -> str:
+    """Match %, _ and \\ in user input literally inside a LIKE pattern (escape='\\')."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
 def list_courses(
     user_id: int,                           
     limit: int = 25,
     offset: int = 0,
     q: Optional[str] = None,
+    cursor: Optional[int] = None,
 ):
+    """
+    A user's courses, newest first. Page with ?cursor=<next_cursor of the previous
+    page>: keyset on course_id, so deep pages cost the same as the first one.
+    next_cursor (next to 'data') is null on the last page; offset still works
+    but scans every skipped row. q matches a case-insensitive substring of the
+    name (trigram-indexed on Postgres).
+    """
     if _SESSION_FACTORY is None:
         return _fail("Server misconfigured: no DB session factory is set.")
 
@@ -213,16 +156,25 @@ def list_courses(
         stmt = select(
             Course.course_id,
             Course.course_name,
-            func.length(Course.course_content).label("content_len"),
+            # stored at ingest; only rows from before chunking fall back to measuring the blob
+            func.coalesce(Course.content_length, func.length(Course.course_content)).label("content_len"),
             Course.user_id,
         ).where(Course.user_id == user_id)
 
         if q:
-            stmt = stmt.where(func.lower(Course.course_name).like(f"%{q.lower()}%"))
+            stmt = stmt.where(Course.course_name.ilike(f"%{_escape_like(q)}%", escape="\\"))
 
-        stmt = stmt.order_by(Course.course_id.desc()).offset(offset).limit(limit)
+        if cursor is not None:
+            stmt = stmt.where(Course.course_id < cursor)
+        elif offset:
+            stmt = stmt.offset(offset)
+
+        # one extra row tells whether there is a next page
+        stmt = stmt.order_by(Course.course_id.desc()).limit(limit + 1)
 
         rows = db.execute(stmt).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         payload = [
             {
                 "course_id": r.course_id,
@@ -237,10 +189,13 @@ def list_courses(
         if not payload:
             msg = f"No courses found for user_id={user_id}."
 
-        return _success(json.dumps(payload, ensure_ascii=False), message=msg)
+        response = _success(json.dumps(payload, ensure_ascii=False), message=msg)
+        response["next_cursor"] = rows[-1].course_id if has_more else None
+        return response
     
 # --- GET /courses/{course_id} ---
-def get_course(course_id: int):
+def get_course(course_id: int, include_content: bool = True):
+    """include_content=false returns metadata only; page through GET /courses/{id}/chunks instead."""
     if _SESSION_FACTORY is None:
         return _fail("Server misconfigured: no DB session factory is set.")
 
@@ -249,7 +204,7 @@ def get_course(course_id: int):
             select(
                 Course.course_id,
                 Course.course_name,
-                Course.course_content,
+                func.coalesce(Course.content_length, func.length(Course.course_content)).label("content_len"),
                 Course.user_id,        
             ).where(Course.course_id == course_id)
         ).one_or_none()
@@ -257,75 +212,177 @@ def get_course(course_id: int):
         if not row:
             return _fail(f"Course id={course_id} not found")
 
-        m = row._mapping
         payload = {
-            "course_id": m[Course.course_id],
-            "course_name": m[Course.course_name],
-            "course_content": m[Course.course_content],
-            "user_id": m[Course.user_id],
+            "course_id": row.course_id,
+            "course_name": row.course_name,
+            "content_len": int(row.content_len or 0),
+            "user_id": row.user_id,
         }
+        if include_content:
+            payload["course_content"] = load_course_text(db, course_id)
         return _success(json.dumps(payload, ensure_ascii=False),
                         message=f"Fetched course id={course_id}.")
 
 
+# --- GET /courses/{course_id}/chunks ---
+def get_course_chunks(course_id: int, start: int = 0, limit: int = 20):
+    """Chunks [start, start+limit) in reading order, with their page/slide ranges and token counts."""
+    if _SESSION_FACTORY is None:
+        return _fail("Server misconfigured: no DB session factory is set.")
+
+    start = max(0, start)
+    limit = max(1, min(limit, 100))
+
+    stmt = (
+        select(CourseChunk)
+        .where(CourseChunk.course_id == course_id, CourseChunk.chunk_index >= start)
+        .order_by(CourseChunk.chunk_index)
+        .limit(limit)
+    )
+    with _SESSION_FACTORY() as db:
+        rows = db.execute(stmt).scalars().all()
+        if not rows and start == 0:
+            ensure_chunks(db, course_id)  # course stored before chunking existed
+            rows = db.execute(stmt).scalars().all()
+
+        payload = [
+            {
+                "chunk_index": r.chunk_index,
+                "source_name": r.source_name,
+                "unit_type": r.unit_type,
+                "unit_start": r.unit_start,
+                "unit_end": r.unit_end,
+                "char_start": r.char_start,
+                "char_end": r.char_end,
+                "token_count": r.token_count,
+                "content": r.content,
+            }
+            for r in rows
+        ]
+
+    if not payload:
+        return _fail(f"No chunks found for course_id={course_id} from chunk {start}")
+    return _success(json.dumps(payload, ensure_ascii=False),
+                    message=f"Fetched {len(payload)} chunk(s) for course_id={course_id}.")
+
+
 # --- POST /courses/{course_id}/summary ---
-def generate_course_summary(course_id: int, body: dict = Body(...)):
+_SUMMARY_MAP = {"short": 250, "medium": 500, "long": 1000}
+
+async def generate_course_summary(course_id: int, body: dict = Body(...), regenerate: bool = Query(False),
+                                  background: bool = Query(False)):
     """
-    Generate or replace a summary for a given course_id and length: short|medium|long
+    Generate or replace a summary for a given course_id and length: short|medium|long.
+    The whole course is covered via map-reduce (services/summarizer.py).
+    Identical requests are answered from the LLM response cache unless ?regenerate=true.
+    Runs as a background job; ?background=true returns the job id instead of waiting.
     """
     if _SESSION_FACTORY is None:
         return _fail("Server misconfigured: no DB session factory is set.")
 
     summary_length = body.get("summary_length")
-    summary_map = {"short": 250, "medium": 500, "long": 1000}
-    max_chars = summary_map.get(summary_length.lower())
-    if not max_chars:
+    if not _SUMMARY_MAP.get(str(summary_length or "").lower()):
         return _fail("Invalid summary_length. Use one of: short, medium, long.")
 
-    with _SESSION_FACTORY() as db:
-        row = db.execute(
-            select(Course.course_id, Course.course_name, Course.course_content)
-            .where(Course.course_id == course_id)
-        ).one_or_none()
-        if not row:
-            return _fail(f"Course id={course_id} not found")
+    params = {"course_id": course_id, "summary_length": summary_length, "regenerate": regenerate}
+    return await jobs.run_job("summary", course_id, params, background)
 
-        _, cname, content = row
-        content = (content or "").strip()
-        if not content:
-            return _fail(f"Course id={course_id} has no content")
-
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    system_prompt = (
-        f"You are a helpful teaching assistant. Summarize the following course material in {summary_length} form. "
-        "Explain concepts in very simple, clear language that any student can understand. "
-        "Avoid jargon. Use bullet points and short sentences."
-    )
+async def _summary_job(params: dict) -> dict:
+    course_id = params["course_id"]
+    summary_length = params["summary_length"]
+    max_chars = _SUMMARY_MAP[summary_length.lower()]
 
-    user_prompt = f"Summarize this course content:\n\n{content[:4000]}"
+    if not await run_in_threadpool(_course_exists, course_id):
+        return _fail(f"Course id={course_id} not found")
 
     try:
-        resp = client.responses.create(
-            model="gpt-4o-mini",
-            input=f"{system_prompt}\n\n{user_prompt}",
-            max_output_tokens=max_chars,
-        )
-        summary_text = getattr(resp, "output_text", None) or str(resp)
+        summary_text = await summarize_course(_SESSION_FACTORY, course_id, summary_length, max_chars,
+                                              refresh=params.get("regenerate", False))
     except Exception as e:
         return _fail(f"AI summarization failed: {type(e).__name__}")
+    if not summary_text:
+        return _fail(f"Course id={course_id} has no content")
 
-    with _SESSION_FACTORY() as db:
-        db.execute(
-            delete(Summary).where(Summary.course_id == course_id, Summary.summary_length == summary_length)
-        )
-        db.add(Summary(course_id=course_id, summary_length=summary_length, summary_content=summary_text))
-        db.commit()
+    await run_in_threadpool(_store_summary, course_id, summary_length, summary_text)
 
     return _success(
         summary_text,
         message=f"Summary ({summary_length}) generated and stored for course_id={course_id}."
     )
 
+jobs.register("summary", _summary_job)
+
+
+# --- GET /courses/{course_id}/summary/stream ---
+async def stream_course_summary(
+    course_id: int,
+    summary_length: str = Query(..., description="short | medium | long"),
+    regenerate: bool = Query(False),
+):
+    """
+    Server-Sent Events variant of POST /courses/{course_id}/summary.
+    Events: 'status' while the course is condensed, 'delta' {"text"} per chunk of
+    summary text as the model writes it, then 'done' once the summary is stored
+    (or 'error' {"message"}).
+    """
+    if _SESSION_FACTORY is None:
+        return _fail("Server misconfigured: no DB session factory is set.")
+    max_chars = _SUMMARY_MAP.get(str(summary_length or "").lower())
+    if not max_chars:
+        return _fail("Invalid summary_length. Use one of: short, medium, long.")
+    if not await run_in_threadpool(_course_exists, course_id):
+        return _fail(f"Course id={course_id} not found")
+
+    async def events():
+        yield _sse("status", {"stage": "reading course"})
+        parts: List[str] = []
+        try:
+            material = await build_material(_SESSION_FACTORY, course_id, regenerate)
+            if not material:
+                yield _sse("error", {"message": f"Course id={course_id} has no content"})
+                return
+            yield _sse("status", {"stage": "writing summary"})
+            # aclosing: on disconnect the upstream stream is closed now, not at garbage collection
+            async with aclosing(stream_summary(material, summary_length, max_chars, refresh=regenerate)) as deltas:
+                async for delta in deltas:
+                    parts.append(delta)
+                    yield _sse("delta", {"text": delta})
+        except Exception as e:
+            yield _sse("error", {"message": f"AI summarization failed: {type(e).__name__}"})
+            return
+
+        summary_text = "".join(parts)
+        if not summary_text.strip():
+            # never replace a stored summary with an empty one
+            yield _sse("error", {"message": "AI summarization returned no text"})
+            return
+        await run_in_threadpool(_store_summary, course_id, summary_length, summary_text)
+        yield _sse("done", {"course_id": course_id, "summary_length": summary_length, "chars": len(summary_text)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+def _course_exists(course_id: int) -> bool:
+    with _SESSION_FACTORY() as db:
+        return db.execute(
+            select(Course.course_id).where(Course.course_id == course_id)
+        ).scalar_one_or_none() is not None
+
+def _store_summary(course_id: int, summary_length: str, summary_text: str) -> None:
+    # upsert on uq_course_summary instead of delete + insert, which raced concurrent writers
+    with _SESSION_FACTORY() as db:
+        stmt = pg_insert(Summary).values(
+            course_id=course_id, summary_length=summary_length, summary_content=summary_text
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["course_id", "summary_length"],
+            set_={"summary_content": stmt.excluded.summary_content},
+        ))
+        db.commit()
+
 
 def get_course_summary(
     course_id: int,
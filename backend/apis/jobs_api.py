@@ -0,0 +1,24 @@
+# backend/apis/jobs_api.py
+import json
+
+from starlette.concurrency import run_in_threadpool
+
+from services import jobs
+
+def _fail(msg: str) -> dict:
+    return {"status": "FAIL", "statusCode": 200, "message": msg, "data": ""}
+
+def _success(data_str: str, message: str = "") -> dict:
+    return {"status": "SUCCESS", "statusCode": 200, "message": message, "data": data_str}
+
+# ---------------- GET /jobs/{job_id} ----------------
+async def get_job_status(job_id: str):
+    """
+    Status of a background generation job (summary | flashcards | quiz).
+    'data' is a JSON string with status queued|running|succeeded|failed; once
+    finished, 'result' holds the response the generating POST would have returned.
+    """
+    job = await run_in_threadpool(jobs.get_job, job_id)
+    if job is None:
+        return _fail(f"Job {job_id} not found")
+    return _success(json.dumps(job, ensure_ascii=False), f"Job {job_id} is {job['status']}.")
@@ -1,14 +1,16 @@
-import os, json, re
+import os, json, re, base64
 from typing import Callable, Optional, List, Dict, Any
 
 from dotenv import load_dotenv
-from fastapi import Body
-from sqlalchemy import select, update
+from fastapi import Body, Query
+from sqlalchemy import Integer, column, func, insert, select, tuple_, update, values
 from sqlalchemy.orm import Session
-from openai import OpenAI
 
 from models import Course, Quiz, QuizQuestion
-from datetime import datetime, timezone
+from services.course_chunks import course_context
+from services.llm_clients import openai_client
+from services import jobs
+from datetime import datetime
 
 
 load_dotenv()
@@ -24,8 +26,8 @@ def _fail(msg: str):
 def _success(data_str: str, message: str = ""):
     return {"status": "SUCCESS", "statusCode": 200, "message": message, "data": data_str}
 
-_api_key = os.getenv("OPENAI_API_KEY")
-_client = OpenAI(api_key=_api_key) if _api_key else None
+# Prompt budget (approx. tokens) of course material sent for a quiz
+QUIZ_CONTEXT_TOKENS = int(os.getenv("QUIZ_CONTEXT_TOKENS", "2000"))
 
 _FORBIDDEN = {  # reject low-quality distractors
     "correct", "none of these", "not applicable", "i'm not sure",
@@ -43,14 +45,14 @@ def _bad_options(opts: List[str]) -> bool:
             return True
     return False
 
+# Not behind the LLM response cache: every quiz is a new attempt with new questions
 def _call_model_json(system: str, user: str) -> str:
-    if not _client:
-        raise RuntimeError("OPENAI_API_KEY missing")
+    client = openai_client()
 
     # Prefer Responses API; fallback to Chat Completions
     try:
-        if hasattr(_client, "responses"):
-            resp = _client.responses.create(
+        if hasattr(client, "responses"):
+            resp = client.responses.create(
                 model="gpt-4o-mini",
                 input=[{"role":"system","content":system},
                        {"role":"user","content":user}],
@@ -60,7 +62,7 @@ def _call_model_json(system: str, user: str) -> str:
             return getattr(resp, "output_text", "") or ""
         raise AttributeError
     except (TypeError, AttributeError):
-        chat = _client.chat.completions.create(
+        chat = client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[{"role":"system","content":system},
                       {"role":"user","content":user}],
@@ -79,20 +81,27 @@ def _parse_json(raw: str) -> dict:
         return json.loads(m.group(0))
 
 # ---------------- POST /courses/{course_id}/quiz ----------------
-def create_or_replace_quiz(course_id: int, params: dict = Body(default={})):
+async def create_or_replace_quiz(course_id: int, params: dict = Body(default={}), background: bool = Query(False)):
+    """Runs as a background job; ?background=true returns the job id instead of waiting."""
     if _SESSION_FACTORY is None:
         return _fail("Server misconfigured: no DB session factory is set.")
+    job_params = {"course_id": course_id, "params": params or {}}
+    return await jobs.run_job("quiz", course_id, job_params, background, dedupe=False)
 
-    # 1) load course
-    with _SESSION_FACTORY() as db:
-        row = db.execute(
-            select(Course.course_name, Course.course_content).where(Course.course_id == course_id)
-        ).one_or_none()
-    if not row:
-        return _fail(f"Course id={course_id} not found")
+def _quiz_job(job_params: dict) -> dict:
+    return _create_quiz(job_params["course_id"], job_params["params"])
 
-    cname, content = row
-    content = (content or "").strip()
+def _create_quiz(course_id: int, params: dict) -> dict:
+
+    # 1) load course: chunks from across the course (biased to an optional "topic") within budget
+    topic = str((params or {}).get("topic") or "")
+    with _SESSION_FACTORY() as db:
+        cname = db.execute(
+            select(Course.course_name).where(Course.course_id == course_id)
+        ).scalar_one_or_none()
+        if cname is None:
+            return _fail(f"Course id={course_id} not found")
+        content = course_context(db, course_id, topic, QUIZ_CONTEXT_TOKENS, spread=True)
     if not content:
         return _fail("Course has no content")
 
@@ -109,13 +118,7 @@ def create_or_replace_quiz(course_id: int, params: dict = Body(default={})):
         "- Each question MUST have 4 short distinct options; exactly one correct.\n"
         "- correct_index is an integer 0..3. No commentary/backticks; JSON only."
     )
-    user = f"Create a quiz from this course content (trimmed):\n\n{content[:6000]}"
-
-    try:
-        raw = _call_model_json(base_system, user)
-        data = _parse_json(raw)
-    except Exception as e:
-        return _fail(f"Quiz generation failed during model call: {type(e).__name__}")
+    user = f"Create a quiz from this course content (selected excerpts):\n\n{content}"
 
     def _normalize(data_obj: dict) -> List[dict]:
         qs = data_obj.get("questions")
@@ -144,6 +147,12 @@ def create_or_replace_quiz(course_id: int, params: dict = Body(default={})):
             })
         return out
 
+    try:
+        raw = _call_model_json(base_system, user)
+        data = _parse_json(raw)
+    except Exception as e:
+        return _fail(f"Quiz generation failed during model call: {type(e).__name__}")
+
     try:
         normalized = _normalize(data)
     except Exception:
@@ -172,49 +181,74 @@ def create_or_replace_quiz(course_id: int, params: dict = Body(default={})):
             # ts = datetime.now(timezone.utc).astimezone().strftime("%Y-%m-%d %H:%M")
             user_title = f"{short_cname} - Quiz" if short_cname else f"Quiz"
  
-        quiz = Quiz(course_id=course_id, quiz_title=user_title, is_submitted=False)  # created_at auto
-        db.add(quiz)
-        db.flush()  # get quiz_id
-
-        for q in normalized:
-            db.add(QuizQuestion(
-                quiz_id=quiz.quiz_id,
-                question_index=q["question_index"],
-                question_type=q["question_type"],
-                question_text=q["question_text"],
-                options_json=q["options_json"],
-                correct_index=q["correct_index"],
-            ))
+        # two statements, one transaction: the quiz row (RETURNING its DB-side created_at), then all questions
+        quiz_id, created_at = db.execute(
+            insert(Quiz)
+            .values(course_id=course_id, quiz_title=user_title, is_submitted=False)
+            .returning(Quiz.quiz_id, Quiz.created_at)
+        ).one()
+        saved = db.execute(
+            insert(QuizQuestion)
+            .values([
+                {
+                    "quiz_id": quiz_id,
+                    "question_index": q["question_index"],
+                    "question_type": q["question_type"],
+                    "question_text": q["question_text"],
+                    "options_json": q["options_json"],
+                    "correct_index": q["correct_index"],
+                }
+                for q in normalized
+            ])
+            .returning(QuizQuestion.question_id)
+        ).all()
         db.commit()
-        quiz_id = quiz.quiz_id
 
-    # payload = {"quiz_id": quiz_id, "course_id": course_id, "questions_saved": 10}
-    # return _success(json.dumps(payload), f"New quiz created for course_id={course_id}.")
     payload = {
         "quiz_id": quiz_id,
         "course_id": course_id,
         "quiz_title": user_title,
-        # created_at is DB default; fetch it to return
+        "created_at": created_at.isoformat() if created_at else None,
+        "questions_saved": len(saved),
     }
-    # fetch created_at to return
-    with _SESSION_FACTORY() as db:
-        row = db.execute(select(Quiz.created_at).where(Quiz.quiz_id == quiz_id)).one()
-        payload["created_at"] = row[0].isoformat() if row and row[0] else None
-        payload["questions_saved"] = 10
     return _success(json.dumps(payload), f"New quiz created for course_id={course_id}.")
 
+jobs.register("quiz", _quiz_job)
 
 
 # GET /courses/{course_id}/quizzes  -> list quiz ids
-def list_quizzes_for_course(course_id: int):
+def _quiz_cursor(created_at: datetime, quiz_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{quiz_id}".encode()).decode()
+
+def _parse_quiz_cursor(cursor: str):
+    created_at, quiz_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(created_at), int(quiz_id)
+
+def list_quizzes_for_course(course_id: int, limit: int = 20, cursor: Optional[str] = None):
+    """
+    Submitted quizzes of a course, newest first, `limit` per page. Pass the
+    previous page's next_cursor as ?cursor= for the next one (keyset on
+    (created_at, quiz_id), so every page costs the same); null on the last page.
+    """
     if _SESSION_FACTORY is None:
         return _fail("Server misconfigured: no DB session factory is set.")
+    limit = max(1, min(limit, 100))
+    stmt = (
+        select(Quiz.quiz_id, Quiz.quiz_title, Quiz.created_at, Quiz.correct_count)
+        .where(Quiz.course_id == course_id, Quiz.is_submitted == True)
+    )
+    if cursor:
+        try:
+            after = _parse_quiz_cursor(cursor)
+        except Exception:
+            return _fail("Invalid cursor.")
+        stmt = stmt.where(tuple_(Quiz.created_at, Quiz.quiz_id) < after)
     with _SESSION_FACTORY() as db:
-            rows = db.execute(
-            select(Quiz.quiz_id, Quiz.quiz_title, Quiz.created_at, Quiz.correct_count)
-            .where(Quiz.course_id == course_id, Quiz.is_submitted == True)
-            .order_by(Quiz.created_at.desc())
+        rows = db.execute(
+            stmt.order_by(Quiz.created_at.desc(), Quiz.quiz_id.desc()).limit(limit + 1)
         ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     items = [
         {
             "quiz_id": r[0],
@@ -224,8 +258,9 @@ def list_quizzes_for_course(course_id: int):
         }
         for r in rows
     ]
+    next_cursor = _quiz_cursor(rows[-1][2], rows[-1][0]) if has_more else None
     return _success(
-        json.dumps({"course_id": course_id, "quizzes": items}),
+        json.dumps({"course_id": course_id, "quizzes": items, "next_cursor": next_cursor}),
         f"Found {len(items)} quizzes for course_id={course_id}."
     )
 
@@ -312,6 +347,9 @@ def submit_quiz_answers(
     - All items must reference the same quiz (path {quiz_id}).
     - Upserts student's selected index for each question.
     - Overwrites previous selection if already set.
+    - Grading is two statements whatever the question count: one bulk UPDATE
+      from a VALUES list, and the quiz update with correct_count counted in SQL
+      (all correctly answered questions of the quiz).
     """
     if _SESSION_FACTORY is None:
         return _fail("Server misconfigured: no DB session factory is set.")
@@ -336,46 +374,44 @@ def submit_quiz_answers(
             return _fail(f"Item {i} invalid: {ve}")
         cleaned.append((q_index, sel_idx))
 
-    updated = 0
-    missing = []     
-    correct = 0       
+    # a question answered twice in one body keeps its last answer
+    latest = dict(cleaned)
+    # as a CTE (WITH answers(...) AS (VALUES ...)), which Postgres and SQLite both accept
+    answer_rows = values(
+        column("question_index", Integer), column("selected_index", Integer), name="answers"
+    ).data(list(latest.items())).cte("answers")
 
     with _SESSION_FACTORY() as db:
-        for q_index, sel_idx in cleaned:
-            # Is there such a question for this quiz?
-            row = db.execute(
-                select(QuizQuestion.question_id, QuizQuestion.correct_index)
-                .where(
-                    QuizQuestion.quiz_id == quiz_id,
-                    QuizQuestion.question_index == q_index
-                )
-            ).one_or_none()
-
-            if not row:
-                missing.append(q_index)
-                continue
-
-            qid, correct_idx = row
-           
-            db.execute(
-                update(QuizQuestion)
-                .where(QuizQuestion.question_id == qid)
-                .values(student_selected_index=sel_idx)
-            )
-            updated += 1
-            if sel_idx == correct_idx:
-                correct += 1
-
-     
-        quiz_row = db.get(Quiz, quiz_id)
-        if not quiz_row:
+        # 1) every answer in one UPDATE ... FROM answers RETURNING
+        graded = db.execute(
+            update(QuizQuestion)
+            .where(QuizQuestion.quiz_id == quiz_id, QuizQuestion.question_index == answer_rows.c.question_index)
+            .values(student_selected_index=answer_rows.c.selected_index)
+            .returning(QuizQuestion.question_index)
+        ).scalars().all()
+
+        # 2) mark submitted; correct_count is counted by the database in the same statement
+        correct_count = (
+            select(func.count())
+            .where(QuizQuestion.quiz_id == quiz_id,
+                   QuizQuestion.student_selected_index == QuizQuestion.correct_index)
+            .scalar_subquery()
+        )
+        correct = db.execute(
+            update(Quiz)
+            .where(Quiz.quiz_id == quiz_id)
+            .values(is_submitted=True, correct_count=correct_count)
+            .returning(Quiz.correct_count)
+        ).scalar_one_or_none()
+        if correct is None:
+            db.rollback()
             return _fail(f"Quiz {quiz_id} not found.")
-        quiz_row.is_submitted = True
-        quiz_row.correct_count = correct
-      
 
         db.commit()
 
+    updated = len(graded)
+    missing = sorted(set(latest) - set(graded))
+
     payload = {
         "quiz_id": quiz_id,
         "updated": updated,
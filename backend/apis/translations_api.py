@@ -0,0 +1,91 @@
+# backend/apis/translations_api.py
+import json
+
+from fastapi import Query
+
+from services import artifact_translations
+
+def _fail(msg: str) -> dict:
+    return {"status": "FAIL", "statusCode": 200, "message": msg, "data": ""}
+
+def _success(data_str: str, message: str = "") -> dict:
+    return {"status": "SUCCESS", "statusCode": 200, "message": message, "data": data_str}
+
+def _bad_language(language: str) -> bool:
+    language = (language or "").strip()
+    return len(language) < 2 or len(language) > 64
+
+
+# ---------------- GET /courses/{course_id}/summary/translation ----------------
+async def get_summary_translation(
+    course_id: int,
+    summary_length: str = Query(..., description="short | medium | long"),
+    language: str = Query(..., description="e.g., Spanish, Marathi, Chinese (Simplified)"),
+    regenerate: bool = Query(False),
+):
+    """
+    The stored summary in `language`. Translated once and stored; later reads
+    come from the database until the summary is regenerated.
+    """
+    length = (summary_length or "").strip().lower()
+    if length not in {"short", "medium", "long"}:
+        return _fail("Invalid summary_length. Use one of: short, medium, long.")
+    if _bad_language(language):
+        return _fail("Invalid language.")
+    try:
+        payload = await artifact_translations.summary_translation(course_id, length, language, refresh=regenerate)
+    except Exception as e:
+        print("Summary translation error:", e)
+        return _fail(f"Translation failed: {type(e).__name__}")
+    if payload is None:
+        return _fail(
+            f"No summary found for course_id={course_id} and length='{length}'. "
+            f"POST /courses/{course_id}/summary to generate one."
+        )
+    return _success(json.dumps(payload, ensure_ascii=False),
+                    f"Fetched {payload['language']} summary for course_id={course_id}, length={length}.")
+
+
+# ---------------- GET /courses/{course_id}/flashcards/translation ----------------
+async def get_flashcards_translation(
+    course_id: int,
+    language: str = Query(..., description="e.g., Spanish, Marathi, Chinese (Simplified)"),
+    regenerate: bool = Query(False),
+):
+    """
+    The course's flashcards in `language`, same shape as GET /courses/{course_id}/flashcards.
+    """
+    if _bad_language(language):
+        return _fail("Invalid language.")
+    try:
+        cards = await artifact_translations.flashcard_translations(course_id, language, refresh=regenerate)
+    except Exception as e:
+        print("Flashcard translation error:", e)
+        return _fail(f"Translation failed: {type(e).__name__}")
+    if not cards:
+        return _fail(f"No flashcards found for course_id={course_id}.")
+    return _success(json.dumps(cards, ensure_ascii=False),
+                    f"Fetched {len(cards)} translated flashcard(s) for course_id={course_id}.")
+
+
+# ---------------- GET /quizzes/{quiz_id}/translation ----------------
+async def get_quiz_translation(
+    quiz_id: int,
+    language: str = Query(..., description="e.g., Spanish, Marathi, Chinese (Simplified)"),
+    regenerate: bool = Query(False),
+):
+    """
+    The quiz's questions and options in `language`; indices, correct_index and
+    the student's answers are the same as in GET /quizzes/{quiz_id}.
+    """
+    if _bad_language(language):
+        return _fail("Invalid language.")
+    try:
+        questions = await artifact_translations.quiz_translation(quiz_id, language, refresh=regenerate)
+    except Exception as e:
+        print("Quiz translation error:", e)
+        return _fail(f"Translation failed: {type(e).__name__}")
+    if not questions:
+        return _fail(f"No questions found for quiz_id={quiz_id}")
+    return _success(json.dumps({"quiz_id": quiz_id, "questions": questions}, ensure_ascii=False),
+                    f"Fetched translated quiz {quiz_id}.")
@@ -1,36 +1,36 @@
 # backend/app.py
+import asyncio
 import os
 import uvicorn
-from fastapi import FastAPI, File, UploadFile
+from contextlib import aclosing, asynccontextmanager
+from fastapi import FastAPI, Request
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 from apis.auth_api import SignUpAPI, LoginAPI
 from models import init_models  # from models/db_model.py
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import List, Literal
-import google.generativeai as genai
 
-from fastapi import HTTPException, Body
+from fastapi import HTTPException, Header
 
-from fastapi.responses import StreamingResponse
-from elevenlabs import ElevenLabs
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from typing import Optional
 
 
-
-from PyPDF2 import PdfReader
-
 # Import ONLY the functions (no router) from gpt_api
 from apis.gpt_api import (
     set_session_factory,
     ingest_and_store_endpoint,
     list_courses,
     get_course,
+    get_course_chunks,
     generate_course_summary,
-    get_course_summary, 
+    get_course_summary,
+    stream_course_summary,
 )
 
 from apis.flashcards_api import (
@@ -47,12 +47,33 @@ from apis.quiz_api import (
     submit_quiz_answers
 )
 
+from apis.jobs_api import get_job_status
+
+from apis.audio_pack_api import (
+    set_session_factory_for_audio_pack,
+    create_audio_pack,
+    get_audio_pack,
+    get_audio_pack_file,
+)
+
+from apis.translations_api import (
+    get_summary_translation,
+    get_flashcards_translation,
+    get_quiz_translation,
+)
+
 from apis.user_api import (
     get_user_by_id,
     get_user_by_query,
     set_session_factory_for_user,
 )
 
+from services import artifact_translations, chat_sessions, context_store, extract_cache, jobs, llm_cache, speech, translation, tts_cache
+from services.extraction import extract_upload, join_parts, shutdown_pool as shutdown_extraction_pool
+from services.uploads import receive_uploads
+from services.llm_clients import close_clients as close_llm_clients, gemini_model
+from services.sse import SSE_HEADERS, sse_event
+
 # --- DB connection lives ONLY here ---
 load_dotenv()  # reads .env at project root
 DATABASE_URL = os.getenv("DATABASE_URL", "")
@@ -64,10 +85,19 @@ SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, futu
 # create tables once
 init_models(engine)
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # generation job workers; also re-queues jobs interrupted by the last shutdown
+    await jobs.start()
+    yield
+    await jobs.stop()
+    # parser worker processes and LLM clients are created lazily on first use
+    shutdown_extraction_pool()
+    speech.shutdown_pool()
+    await close_llm_clients()
 
 # --- FastAPI + URL mappings ---
-app = FastAPI(title="APIs")
+app = FastAPI(title="APIs", lifespan=lifespan)
 
 
 app.add_middleware(
@@ -76,6 +106,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Content-Location"],
 )
 
 # Auth routes (class-callables)
@@ -87,6 +118,13 @@ set_session_factory(SessionLocal)
 set_session_factory_for_flashcards(SessionLocal)
 set_session_factory_for_quiz(SessionLocal)
 set_session_factory_for_user(SessionLocal)
+set_session_factory_for_audio_pack(SessionLocal)
+llm_cache.set_session_factory_for_llm_cache(SessionLocal)
+jobs.set_session_factory_for_jobs(SessionLocal)
+context_store.set_session_factory_for_context_store(SessionLocal)
+chat_sessions.set_session_factory_for_chat_sessions(SessionLocal)
+translation.set_session_factory_for_translation(SessionLocal)
+artifact_translations.set_session_factory_for_artifact_translations(SessionLocal)
 
 app.add_api_route("/users/{user_id}", get_user_by_id, methods=["GET"])
 app.add_api_route("/user", get_user_by_query, methods=["GET"])
@@ -95,17 +133,28 @@ app.add_api_route("/user", get_user_by_query, methods=["GET"])
 app.add_api_route("/addcourse", ingest_and_store_endpoint, methods=["POST"])
 app.add_api_route("/courses",      list_courses,              methods=["GET"])
 app.add_api_route("/courses/{course_id}", get_course,         methods=["GET"])
+app.add_api_route("/courses/{course_id}/chunks", get_course_chunks, methods=["GET"])
 app.add_api_route("/courses/{course_id}/summary", generate_course_summary, methods=["POST"])
 app.add_api_route("/courses/{course_id}/summary", get_course_summary,      methods=["GET"])
+app.add_api_route("/courses/{course_id}/summary/stream", stream_course_summary, methods=["GET"])
+app.add_api_route("/courses/{course_id}/summary/translation", get_summary_translation, methods=["GET"])
 
 app.add_api_route("/courses/{course_id}/flashcards", create_or_replace_flashcards, methods=["POST"])
 app.add_api_route("/courses/{course_id}/flashcards", get_flashcards,              methods=["GET"])
+app.add_api_route("/courses/{course_id}/flashcards/translation", get_flashcards_translation, methods=["GET"])
 
 app.add_api_route("/courses/{course_id}/quiz", create_or_replace_quiz, methods=["POST"])
 app.add_api_route("/courses/{course_id}/quizzes", list_quizzes_for_course, methods=["GET"])
 app.add_api_route("/quizzes/{quiz_id}", get_quiz_by_id, methods=["GET"])
+app.add_api_route("/quizzes/{quiz_id}/translation", get_quiz_translation, methods=["GET"])
 app.add_api_route("/quizzes/{quiz_id}/answers",submit_quiz_answers,methods=["POST"])
 
+app.add_api_route("/courses/{course_id}/audio-pack", create_audio_pack, methods=["POST"])
+app.add_api_route("/courses/{course_id}/audio-pack", get_audio_pack,    methods=["GET"])
+app.add_api_route("/courses/{course_id}/audio-pack/files/{file_name}", get_audio_pack_file, methods=["GET"])
+
+app.add_api_route("/jobs/{job_id}", get_job_status, methods=["GET"])
+
 
 # ---------- Data Models ---------- #
 class ChatTurn(BaseModel):
@@ -115,100 +164,244 @@ class ChatTurn(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     history: List[ChatTurn] = []  # optional chat history
+    regenerate: bool = False  # skip the LLM response cache
+    # context: an uploaded document (doc_id from /upload_pdf) or a stored course;
+    # with neither, the caller's latest upload is used
+    doc_id: Optional[str] = None
+    course_id: Optional[int] = None
+    user_id: Optional[int] = None
+    session_id: Optional[str] = None
+    # server-side conversation (POST /chat/sessions): history is then kept by the server
+    # and the 'history' field is ignored
+    chat_session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     answer: str
 
-# Global variable to store extracted text
-pdf_text_cache = ""
+# Prompt budget (approx. tokens) of document/course passages put in front of a chat message
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "1500"))
 
 # ---------- Upload PDF Endpoint ---------- #
 @app.post("/upload_pdf")
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(request: Request):
     """
-    Uploads a PDF and extracts its text content.
+    Uploads a PDF (multipart field 'file', optional fields 'user_id' / 'session_id')
+    and extracts its text content into the chat context store.
+    The file is streamed to disk in chunks and rejected as soon as it passes the size limit.
+    Returns a doc_id to send with /chat.
     """
-    global pdf_text_cache
-    pdf_text_cache = ""
+    async with receive_uploads(request) as (fields, uploads):
+        upload = next((u for u in uploads if u.field == "file"), None)
+        if upload is None:
+            raise HTTPException(status_code=400, detail="Send the PDF as multipart form-data under key 'file'.")
+        # same extractor chain as /addcourse, served from the content-hash cache on re-uploads
+        text = join_parts(await extract_upload(upload))
+
+    if not text:
+        return {"message": "No readable text found in PDF."}
+
+    user_id = fields.get("user_id")
+    doc_id = await run_in_threadpool(
+        context_store.save_document, upload.filename, upload.sha256, text,
+        int(user_id) if user_id and user_id.isdigit() else None, fields.get("session_id") or None,
+    )
+    return {"message": "PDF uploaded and text extracted successfully.", "doc_id": doc_id, "text_preview": text[:500]}
+
+# ---------- Extraction cache stats ---------- #
+@app.get("/extract/cache/stats")
+def extract_cache_stats():
+    return extract_cache.stats()
 
-    contents = await file.read()
-    pdf_stream = io.BytesIO(contents)
+# ---------- LLM response cache stats ---------- #
+@app.get("/llm/cache/stats")
+def llm_cache_stats():
+    return llm_cache.stats()
 
-    reader = PdfReader(pdf_stream)
-    extracted_text = ""
+# ---------- Chat Endpoint ---------- #
+GEMINI_MODEL = "models/gemini-2.5-flash"
+
+def _chat_inputs(req: ChatRequest):
+    """(history as plain dicts, message with the document/course context prepended). Blocking: DB reads."""
+    doc_id, course_id = req.doc_id, req.course_id
+    if req.chat_session_id:
+        session = chat_sessions.load_session(req.chat_session_id, req.user_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Chat session not found.")
+        history_dicts = chat_sessions.gemini_history(session)
+        doc_id = doc_id or session["doc_id"]
+        course_id = course_id if course_id is not None else session["course_id"]
+    else:
+        # Convert ChatTurn objects to plain dictionaries
+        history_dicts = [{"role": turn.role, "parts": turn.parts} for turn in req.history]
+
+    # retrieval query: the question, plus the previous question for short follow-ups ("why?")
+    previous = [h["parts"][0] for h in history_dicts if h["role"] == "user" and h["parts"]][-1:]
+    query = " ".join(previous + [req.message])
 
-    for page in reader.pages:
-        text = page.extract_text()
+    context = ""
+    if course_id is not None:
+        text = context_store.course_passages(course_id, query, CHAT_CONTEXT_TOKENS)
         if text:
-            extracted_text += text + "\n"
+            context = f"The following content is from the course material:\n\n{text}\n\n"
+    else:
+        doc_id = doc_id or context_store.latest_document_id(req.user_id, req.session_id)
+        text = context_store.document_context(doc_id, query, CHAT_CONTEXT_TOKENS, req.user_id, req.session_id) \
+            if doc_id else ""
+        if text:
+            context = f"The following content is from an uploaded PDF:\n\n{text}\n\n"
+    return history_dicts, context + req.message
 
-    pdf_text_cache = extracted_text.strip()
+_BACKGROUND_TASKS: set = set()  # keeps fire-and-forget tasks referenced until done
 
-    if not pdf_text_cache:
-        return {"message": "No readable text found in PDF."}
+async def _record_turn(req: ChatRequest, answer: str) -> None:
+    """
+    Store the turn in its server-side session, then compact the history off the request path.
+    A failed write is logged; the caller still returns the answer.
+    """
+    if not req.chat_session_id or not answer:
+        return
+    try:
+        await run_in_threadpool(chat_sessions.append_turn, req.chat_session_id, req.message, answer)
+    except Exception as e:
+        print("Storing chat turn failed:", e)
+        return
+    task = asyncio.create_task(_compact_session(req.chat_session_id))
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
 
-    return {"message": "PDF uploaded and text extracted successfully.", "text_preview": pdf_text_cache[:500]}
+async def _compact_session(chat_session_id: str) -> None:
+    try:
+        await chat_sessions.compact(chat_session_id)
+    except Exception as e:
+        print("Chat history compaction failed:", e)
+
+class ChatSessionRequest(BaseModel):
+    user_id: Optional[int] = None
+    doc_id: Optional[str] = None
+    course_id: Optional[int] = None
+
+@app.post("/chat/sessions")
+def create_chat_session(req: ChatSessionRequest):
+    """Start a server-side conversation; send its chat_session_id with /chat instead of the history."""
+    return {"chat_session_id": chat_sessions.create_session(req.user_id, req.doc_id, req.course_id)}
+
+@app.get("/chat/sessions/{chat_session_id}/messages")
+def get_chat_session_messages(chat_session_id: str, user_id: Optional[int] = None):
+    """Full transcript of a conversation (for re-rendering the chat window)."""
+    messages = chat_sessions.list_messages(chat_session_id, user_id)
+    if messages is None:
+        raise HTTPException(status_code=404, detail="Chat session not found.")
+    return {"chat_session_id": chat_session_id, "messages": messages}
 
-# ---------- Chat Endpoint ---------- #
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest):
     """
     Receives a question and optional chat history.
     Uses PDF text (if available) as context.
     """
+    history_dicts, prompt = await run_in_threadpool(_chat_inputs, req)
+    model = gemini_model(GEMINI_MODEL)
 
-    # Convert ChatTurn objects to plain dictionaries
-    history_dicts = [{"role": turn.role, "parts": turn.parts} for turn in req.history]
-
-    model = genai.GenerativeModel("models/gemini-2.5-flash")
-
-    # Prepare context if PDF uploaded
-    context = ""
-    if pdf_text_cache:
-        context = f"The following content is from an uploaded PDF:\n\n{pdf_text_cache[:6000]}\n\n"
-    
-    # Start chat with history
-    chat_session = model.start_chat(history=history_dicts)
+    async def _send() -> str:
+        # Start chat with history
+        chat_session = model.start_chat(history=history_dicts)
+        return (await chat_session.send_message_async(prompt)).text or ""
 
     try:
-        response = chat_session.send_message(context + req.message)
-        return ChatResponse(answer=response.text or "")
+        answer = await llm_cache.acached_call(
+            "gemini", GEMINI_MODEL, prompt, {"history": history_dicts}, _send, refresh=req.regenerate,
+        )
     except Exception as e:
         print("Error during Gemini API call:", e)
         return ChatResponse(answer="⚠️ Error processing request.")
+    await _record_turn(req, answer)
+    return ChatResponse(answer=answer)
 
+async def _close_gemini_stream(response) -> None:
+    """
+    Stop a streaming Gemini response. The SDK has no public cancel; closing its
+    chunk iterator releases the RPC call, which gRPC then cancels.
+    """
+    iterator = getattr(response, "_iterator", None)
+    try:
+        if hasattr(iterator, "cancel"):
+            iterator.cancel()
+        elif hasattr(iterator, "aclose"):
+            await iterator.aclose()
+    except Exception as e:
+        print("Closing Gemini stream failed:", e)
 
-
-
-
-
-
-
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest, request: Request):
+    """
+    Same request body as /chat, answered as Server-Sent Events: 'delta' {"text"}
+    per chunk as Gemini writes it, then 'done' {"answer"} (or 'error').
+    A client that disconnects cancels the upstream Gemini call.
+    """
+    history_dicts, prompt = await run_in_threadpool(_chat_inputs, req)
+    key = llm_cache.cache_key("gemini", GEMINI_MODEL, prompt, {"history": history_dicts})
+
+    async def events():
+        if not req.regenerate:
+            hit = await run_in_threadpool(llm_cache.get, key)
+            if hit is not None:
+                await _record_turn(req, hit)
+                yield sse_event("delta", {"text": hit})
+                yield sse_event("done", {"answer": hit})
+                return
+
+        parts: List[str] = []
+        response = None
+        try:
+            chat_session = gemini_model(GEMINI_MODEL).start_chat(history=history_dicts)
+            response = await chat_session.send_message_async(prompt, stream=True)
+            async with aclosing(response.__aiter__()) as chunks:
+                async for chunk in chunks:
+                    if await request.is_disconnected():
+                        return  # client left: the finally below stops the upstream stream
+                    try:
+                        text = chunk.text
+                    except ValueError:  # chunk without text parts (e.g. safety metadata)
+                        continue
+                    if text:
+                        parts.append(text)
+                        yield sse_event("delta", {"text": text})
+        except Exception as e:
+            print("Error during Gemini streaming call:", e)
+            yield sse_event("error", {"message": "⚠️ Error processing request."})
+            return
+        finally:
+            if response is not None:
+                await _close_gemini_stream(response)
+
+        answer = "".join(parts)
+        if answer:
+            await run_in_threadpool(llm_cache.put, key, "gemini", GEMINI_MODEL, answer)
+        await _record_turn(req, answer)
+        yield sse_event("done", {"answer": answer})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 
 class TranslateRequest(BaseModel):
     text: str = Field(min_length=1, description="Full text to translate")
     target_language: str = Field(min_length=2, description="e.g., English, Spanish, Marathi, Chinese (Simplified)")
+    regenerate: bool = Field(default=False, description="Skip the translation memory")
 
 class TranslateResponse(BaseModel):
     language: str
     translated_text: str
 
 @app.post("/translate", response_model=TranslateResponse)
-def translate_text(req: TranslateRequest):
+async def translate_text(req: TranslateRequest):
     """
     Translate arbitrary text to the requested language using Gemini.
     Returns only the translated text (no extra explanations).
+    Long texts are split into paragraph/line segments translated concurrently;
+    segments already in the translation memory are not sent again.
     """
     try:
-        model = genai.GenerativeModel("models/gemini-2.5-flash")
-        prompt = (
-            f"Translate the following text to {req.target_language}. "
-            "Return ONLY the translation. Preserve line breaks and bulleting.\n\n"
-            f"{req.text}"
-        )
-        resp = model.generate_content(prompt)
-        out = (resp.text or "").strip()
+        out = await translation.translate_text(req.text, req.target_language, refresh=req.regenerate)
         if not out:
             raise ValueError("Empty translation returned")
         return TranslateResponse(language=req.target_language, translated_text=out)
@@ -220,48 +413,70 @@ def translate_text(req: TranslateRequest):
 
 class TTSRequest(BaseModel):
     text: str
-    voice_id: Optional[str] = "TZXnHeB62zELHhRDHuu1"
-    model_id: Optional[str] = "eleven_multilingual_v2"
-    output_format: Optional[str] = "mp3_44100_128"
-
-
-ELEVEN_KEY = os.getenv("ELEVENLABS_API_KEY")
-if not ELEVEN_KEY:
-    print("⚠️ ELEVENLABS_API_KEY is not set in .env")
-eleven_client = ElevenLabs(api_key=ELEVEN_KEY)
+    voice_id: Optional[str] = speech.DEFAULT_VOICE_ID
+    model_id: Optional[str] = speech.DEFAULT_MODEL_ID
+    output_format: Optional[str] = speech.DEFAULT_OUTPUT_FORMAT
+
+
+def _cached_audio(key: str, if_none_match: Optional[str]):
+    found = tts_cache.get_path(key)
+    if found is None:
+        return None
+    path, output_format = found
+    headers = {
+        "ETag": tts_cache.etag(key),
+        "Content-Location": f"/tts/{key}",
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if if_none_match and tts_cache.etag(key) in if_none_match:
+        return Response(status_code=304, headers=headers)
+    # FileResponse answers Range requests (206) and sets Accept-Ranges
+    return FileResponse(path, media_type=tts_cache.media_type(output_format), headers=headers)
 
 @app.post("/tts")
-def tts(req: TTSRequest):
+def tts(req: TTSRequest, if_none_match: Optional[str] = Header(None)):
     """
     Convert text to speech with ElevenLabs and stream MP3 back to the client.
     Do NOT play server-side. Just return audio bytes.
+    Texts of any length (up to TTS_MAX_CHARS; wav/opus up to TTS_SEGMENT_CHARS)
+    play as one stream; see services/speech.py.
+    Audio is cached on disk per (text, voice, model, format): a hit is served
+    from the cache, a miss streams from ElevenLabs while being written to it.
+    Content-Location names the GET /tts/{key} URL of the cached audio.
     """
     if not req.text or not req.text.strip():
         raise HTTPException(status_code=400, detail="Text is required.")
 
-    if not ELEVEN_KEY:
-        raise HTTPException(status_code=500, detail="ElevenLabs API key missing on server.")
-
-    # ElevenLabs text size limits are generous but we’ll be safe:
     text = req.text.strip()
-    if len(text) > 5000:
-        text = text[:5000]
+    voice_id = req.voice_id or speech.DEFAULT_VOICE_ID
+    model_id = req.model_id or speech.DEFAULT_MODEL_ID
+    output_format = req.output_format or speech.DEFAULT_OUTPUT_FORMAT
+    # mp3/pcm/ulaw are split into segments; wav/opus must fit one ElevenLabs request
+    if len(text) > speech.max_chars(output_format):
+        raise HTTPException(
+            status_code=413,
+            detail=f"Text is longer than {speech.max_chars(output_format)} characters for {output_format}.",
+        )
+    key = tts_cache.cache_key(text, voice_id, model_id, output_format)
+
+    cached = _cached_audio(key, if_none_match)
+    if cached is not None:
+        return cached
+
+    if not speech.ELEVEN_KEY:
+        raise HTTPException(status_code=500, detail="ElevenLabs API key missing on server.")
 
     try:
-        # eleven_client.text_to_speech.convert returns an iterator of bytes chunks
-        audio_iter = eleven_client.text_to_speech.convert(
-            text=text,
-            voice_id=req.voice_id or "TZXnHeB62zELHhRDHuu1",
-            model_id=req.model_id or "eleven_multilingual_v2",
-            output_format=req.output_format or "mp3_44100_128",
-        )
+        # split into sentence segments, synthesized a few segments ahead of playback
+        audio_iter = speech.synthesize(text, voice_id, model_id, output_format)
 
         # Wrap generator in StreamingResponse so the browser can play as it arrives
         return StreamingResponse(
-            audio_iter,
-            media_type="audio/mpeg",  # mp3
+            tts_cache.tee(key, output_format, audio_iter),
+            media_type=tts_cache.media_type(output_format),
             headers={
-                # Allow the browser to stream/play
+                "ETag": tts_cache.etag(key),
+                "Content-Location": f"/tts/{key}",
                 "Cache-Control": "no-store",
             },
         )
@@ -269,6 +484,19 @@ def tts(req: TTSRequest):
         print("TTS error:", e)
         raise HTTPException(status_code=500, detail="TTS generation failed.")
 
+@app.get("/tts/{key}")
+def tts_audio(key: str, if_none_match: Optional[str] = Header(None)):
+    """Cached audio by key, with ETag and Range support so players can seek; typed by its stored format."""
+    cached = _cached_audio(key, if_none_match) if tts_cache.is_key(key) else None
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Audio not cached. POST /tts to synthesize it.")
+    return cached
+
+# ---------- TTS audio cache stats ---------- #
+@app.get("/tts/cache/stats")
+def tts_cache_stats():
+    return tts_cache.stats()
+
 
 
 if __name__ == "__main__":
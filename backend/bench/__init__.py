@@ -0,0 +1,2 @@
+# backend/bench/__init__.py
+# (benchmark scripts; run from backend/ with `python -m bench.<name>`)
@@ -0,0 +1,61 @@
+# backend/bench/bench_backends.py
+"""
+Speed and memory of every extraction backend over a generated corpus.
+
+    cd backend
+    python -m bench.bench_backends --files 3 --pages 40
+
+Each backend runs in a fresh process (all parsers imported in every one) so
+the peak RSS columns are comparable and not polluted by the other backends.
+"pages" means PDF pages, PPTX slides, or the page-sized paragraph groups the
+corpus writes into DOCX files. Use the table to pick the first
+entry of EXTRACT_BACKENDS_<TYPE>.
+"""
+import argparse
+import multiprocessing as mp
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import TemporaryDirectory
+
+from bench.corpus import make_corpus
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _measure(ext: str, backend: str, paths):
+    from services.extraction import BACKENDS, join_parts
+
+    reader = BACKENDS[ext][backend]
+    base = _peak_rss_mb()  # parsers imported, nothing parsed yet
+    chars = 0
+    t0 = time.perf_counter()
+    for p in paths:
+        chars += len(join_parts(reader(p)))
+    return time.perf_counter() - t0, base, _peak_rss_mb(), chars
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=3, help="files per format")
+    ap.add_argument("--pages", type=int, default=40)
+    args = ap.parse_args()
+
+    from services.extraction import BACKENDS
+
+    ctx = mp.get_context("spawn")
+    with TemporaryDirectory() as d:
+        paths = make_corpus(d, files_per_type=args.files, pages=args.pages)
+        total_pages = args.files * args.pages
+        print(f"{'type':<6} {'backend':<12} {'pages/s':>10} {'base MB':>9} {'peak MB':>9} {'chars':>10}")
+        for ext, backends in BACKENDS.items():
+            files = [p for p in paths if p.endswith(ext)]
+            for name in backends:
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+                    elapsed, base, peak, chars = ex.submit(_measure, ext, name, files).result()
+                print(f"{ext:<6} {name:<12} {total_pages / elapsed:>10.1f} {base:>9.1f} {peak:>9.1f} {chars:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# backend/bench/bench_extract.py
+"""
+Throughput of /addcourse extraction when many files are uploaded at once.
+
+    cd backend
+    python -m bench.bench_extract --files 8 --pages 30 --workers 4
+
+Compares the old in-loop sequential parsing against `extract_uploads`
+(process pool), and reports files/sec plus how long the event loop was blocked.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+from tempfile import TemporaryDirectory
+
+from bench.corpus import make_corpus
+from services.uploads import SpooledUpload
+
+
+def _uploads(paths):
+    """What receive_uploads() hands the endpoint once the request body has streamed to disk."""
+    out = []
+    for p in paths:
+        with open(p, "rb") as f:
+            sha = hashlib.sha256(f.read()).hexdigest()
+        name = os.path.basename(p)
+        out.append(SpooledUpload("files", name, os.path.splitext(name)[1], p, sha, os.path.getsize(p)))
+    return out
+
+async def _loop_lag(stop: asyncio.Event) -> float:
+    """Largest gap between 10 ms ticks = worst stall other requests would see."""
+    worst = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.01)
+        now = time.perf_counter()
+        worst = max(worst, now - last - 0.01)
+        last = now
+    return worst
+
+async def _run(label, coro_factory, paths):
+    uploads = _uploads(paths)
+    stop = asyncio.Event()
+    lag = asyncio.create_task(_loop_lag(stop))
+    await asyncio.sleep(0.02)  # let the lag probe start ticking
+    t0 = time.perf_counter()
+    try:
+        await coro_factory(uploads)
+    finally:
+        elapsed = time.perf_counter() - t0
+        stop.set()
+    worst = await lag
+    print(f"{label:<22} {len(paths):>5} files  {elapsed:8.2f}s  {len(paths) / elapsed:8.2f} files/s  "
+          f"max loop stall {worst * 1000:8.1f} ms")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=6, help="files per format")
+    ap.add_argument("--pages", type=int, default=30)
+    ap.add_argument("--workers", type=int, default=0, help="EXTRACT_WORKERS override")
+    args = ap.parse_args()
+    if args.workers:
+        os.environ["EXTRACT_WORKERS"] = str(args.workers)
+    cache_dir = TemporaryDirectory()  # cold extraction cache: measure parsing, not hits
+    os.environ["EXTRACT_CACHE_DIR"] = cache_dir.name
+
+    from services import extraction  # import after the env overrides are set
+
+    async def sequential(uploads):
+        for up in uploads:  # what the endpoint used to do: parse on the event loop
+            extraction.extract_file(up.path, up.ext)
+
+    with TemporaryDirectory() as d:
+        paths = make_corpus(d, files_per_type=args.files, pages=args.pages)
+        print(f"workers={extraction.EXTRACT_WORKERS}")
+        asyncio.run(_run("sequential (in loop)", sequential, paths))
+        asyncio.run(_run("process pool", extraction.extract_uploads, paths))
+    extraction.shutdown_pool()
+    cache_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# backend/bench/bench_grading.py
+"""
+Statements and latency of POST /quizzes/{quiz_id}/answers by question count.
+
+    cd backend
+    python -m bench.bench_grading --questions 10 50 200
+
+Uses the database in DATABASE_URL (Postgres in production; sqlite works too).
+Creates a throwaway course and quizzes (bench/quiz_data.py), counts every
+statement the handler sends, and deletes the course again. Fails if the
+statement count is not the same for every question count (the per-question
+loop used to send 2n + 2); tests/test_quiz_grading.py checks the same in the
+test suite.
+"""
+import argparse
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from apis.quiz_api import set_session_factory_for_quiz, submit_quiz_answers
+from bench.quiz_data import answers_for, drop_course, recorded_statements, seed_quizzes
+from models import init_models
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--questions", type=int, nargs="+", default=[10, 50, 200])
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args()
+
+    load_dotenv()
+    engine = create_engine(os.environ["DATABASE_URL"], future=True, pool_pre_ping=True)
+    init_models(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    set_session_factory_for_quiz(SessionLocal)
+
+    course_id, quiz_ids = seed_quizzes(SessionLocal, args.questions)
+    try:
+        counts = {}
+        print(f"{'questions':>10} {'statements':>11} {'ms/submit':>10}")
+        for n, quiz_id in quiz_ids.items():
+            answers = answers_for(n)
+            with recorded_statements(engine) as statements:
+                result = submit_quiz_answers(quiz_id, answers)
+            assert result["status"] == "SUCCESS", result
+            count = counts[n] = len(statements)
+            t0 = time.perf_counter()
+            for _ in range(args.rounds):
+                submit_quiz_answers(quiz_id, answers)
+            ms = (time.perf_counter() - t0) * 1000 / args.rounds
+            print(f"{n:>10} {count:>11} {ms:>10.1f}   correct_count={json.loads(result['data'])['correct_count']}")
+        assert len(set(counts.values())) == 1, f"statement count grows with the question count: {counts}"
+    finally:
+        drop_course(SessionLocal, course_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# backend/bench/corpus.py
+"""Generates synthetic PDF / DOCX / PPTX course files for the benchmarks."""
+import os
+import random
+from typing import List
+
+from docx import Document as DocxDocument
+from pptx import Presentation
+from pptx.util import Inches
+
+_WORDS = (
+    "requirement stakeholder process model system design test cache entropy vector "
+    "matrix gradient protocol network kernel thread memory schedule graph tree proof"
+).split()
+
+def _sentence(rng: random.Random, n: int = 12) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n)).capitalize() + "."
+
+def _lines(rng: random.Random, count: int) -> List[str]:
+    return [_sentence(rng) for _ in range(count)]
+
+def write_pdf(path: str, pages: List[List[str]]) -> None:
+    """Minimal hand-rolled PDF (Helvetica text, one content stream per page)."""
+    objs: List[bytes] = []
+    n_pages = len(pages)
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(n_pages))
+    objs.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {n_pages} >>".encode())
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, lines in enumerate(pages):
+        body = ["BT", "/F1 10 Tf", "50 800 Td", "12 TL"]
+        for line in lines:
+            esc = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            body.append(f"({esc}) Tj T*")
+        body.append("ET")
+        stream = "\n".join(body).encode("latin-1", "replace")
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, obj in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+def write_docx(path: str, paragraphs: List[str]) -> None:
+    doc = DocxDocument()
+    for p in paragraphs:
+        doc.add_paragraph(p)
+    doc.save(path)
+
+def write_pptx(path: str, slides: List[List[str]]) -> None:
+    prs = Presentation()
+    layout = prs.slide_layouts[6]  # blank
+    for lines in slides:
+        slide = prs.slides.add_slide(layout)
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(6))
+        box.text_frame.text = "\n".join(lines)
+    prs.save(path)
+
+def make_corpus(out_dir: str, files_per_type: int = 4, pages: int = 20, seed: int = 7) -> List[str]:
+    """Writes files_per_type files of each format with `pages` pages/slides (or page-sized chunks of paragraphs)."""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths: List[str] = []
+    for i in range(files_per_type):
+        p = os.path.join(out_dir, f"lecture_{i}.pdf")
+        write_pdf(p, [_lines(rng, 40) for _ in range(pages)])
+        paths.append(p)
+
+        p = os.path.join(out_dir, f"notes_{i}.docx")
+        write_docx(p, _lines(rng, 40 * pages))
+        paths.append(p)
+
+        p = os.path.join(out_dir, f"slides_{i}.pptx")
+        write_pptx(p, [_lines(rng, 8) for _ in range(pages)])
+        paths.append(p)
+    return paths
@@ -0,0 +1,53 @@
+# backend/bench/quiz_data.py
+"""Throwaway quizzes for the grading benchmark and tests/test_quiz_grading.py."""
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from models import Course, Quiz, QuizQuestion
+
+
+def seed_quizzes(session_factory: Callable[[], Session], question_counts: Iterable[int],
+                 course_name: str = "bench-grading") -> Tuple[int, Dict[int, int]]:
+    """A course with one quiz per question count; returns (course_id, {question count: quiz_id})."""
+    with session_factory() as db:
+        course = Course(course_name=course_name, course_content="")
+        db.add(course)
+        db.flush()
+        course_id = course.course_id
+        quiz_ids = {}
+        for n in question_counts:
+            quiz = Quiz(course_id=course_id, quiz_title=f"bench {n}")
+            db.add(quiz)
+            db.flush()
+            db.add_all(QuizQuestion(quiz_id=quiz.quiz_id, question_index=i, question_type="mcq", question_text="?",
+                                    options_json="[]", correct_index=i % 4) for i in range(1, n + 1))
+            quiz_ids[n] = quiz.quiz_id
+        db.commit()
+    return course_id, quiz_ids
+
+def answers_for(n: int) -> List[dict]:
+    """Answers for every question of an n-question seeded quiz; the even-numbered ones are correct."""
+    return [{"question_index": i, "student_selected_index": (i * 7) % 4} for i in range(1, n + 1)]
+
+def drop_course(session_factory: Callable[[], Session], course_id: int) -> None:
+    with session_factory() as db:
+        db.delete(db.get(Course, course_id))
+        db.commit()
+
+@contextmanager
+def recorded_statements(engine: Engine) -> Iterator[List[str]]:
+    """Every statement the engine sends while the block runs."""
+    statements: List[str] = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
@@ -4,10 +4,23 @@ from .db_model import (
     init_models,
     User,
     Course,
+    CourseChunk,
+    CourseTermIndex,
     Summary,
+    SummaryPartial,
     Flashcard,
     Quiz,
     QuizQuestion,
+    SummaryTranslation,
+    FlashcardTranslation,
+    QuizQuestionTranslation,
+    AudioPackItem,
+    ChatDocument,
+    ChatSession,
+    ChatMessage,
+    Job,
+    TranslationMemory,
+    LLMCacheEntry,
 )
 
 __all__ = [
@@ -15,8 +28,21 @@ __all__ = [
     "init_models",
     "User",
     "Course",
+    "CourseChunk",
+    "CourseTermIndex",
     "Summary",
+    "SummaryPartial",
     "Flashcard",
     "Quiz",
     "QuizQuestion",
+    "SummaryTranslation",
+    "FlashcardTranslation",
+    "QuizQuestionTranslation",
+    "AudioPackItem",
+    "ChatDocument",
+    "ChatSession",
+    "ChatMessage",
+    "Job",
+    "TranslationMemory",
+    "LLMCacheEntry",
 ]
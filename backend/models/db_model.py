@@ -1,7 +1,7 @@
 from __future__ import annotations
 from typing import Optional
 
-from sqlalchemy import Integer, String, Text, UniqueConstraint, ForeignKey, DateTime, Boolean 
+from sqlalchemy import Integer, String, Text, UniqueConstraint, ForeignKey, DateTime, Boolean, Index, inspect, text
 from sqlalchemy.sql import func
 from datetime import datetime 
 
@@ -23,15 +23,45 @@ class User(Base):
 
 class Course(Base):
     __tablename__ = "courses"
+    # keyset pages of GET /courses; name search uses ix_courses_name_trgm (_add_name_search_index)
+    __table_args__ = (Index("ix_courses_user_course", "user_id", "course_id"),)
 
     course_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     course_name: Mapped[str] = mapped_column(String(255), nullable=False)
     course_content: Mapped[str] = mapped_column(Text, nullable=False)
+    # filled at ingest so listings never measure course_content; NULL on rows from before chunking
+    content_length: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
     user_id: Mapped[Optional[int]] = mapped_column(
         Integer, ForeignKey("User.user_id", ondelete="SET NULL"), nullable=True
     )
 
+class CourseChunk(Base):
+    """Contiguous slice course_content[char_start:char_end], cut on file/page/slide/paragraph boundaries."""
+    __tablename__ = "course_chunks"
+    __table_args__ = (UniqueConstraint("course_id", "chunk_index", name="uq_course_chunk"),)
+
+    chunk_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    course_id: Mapped[int] = mapped_column(Integer, ForeignKey("courses.course_id", ondelete="CASCADE"), nullable=False)
+    chunk_index: Mapped[int] = mapped_column(Integer, nullable=False)  # 0..n-1 in reading order
+    source_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)  # file stem
+    unit_type: Mapped[str] = mapped_column(String(20), nullable=False)  # page | slide | paragraph | text
+    unit_start: Mapped[int] = mapped_column(Integer, nullable=False)  # 1-based page/slide/paragraph
+    unit_end: Mapped[int] = mapped_column(Integer, nullable=False)
+    char_start: Mapped[int] = mapped_column(Integer, nullable=False)
+    char_end: Mapped[int] = mapped_column(Integer, nullable=False)
+    token_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+
+class CourseTermIndex(Base):
+    """Serialized BM25 postings over a course's chunks (services/retrieval.py), built at ingest."""
+    __tablename__ = "course_term_index"
+
+    course_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("courses.course_id", ondelete="CASCADE"), primary_key=True
+    )
+    index_json: Mapped[str] = mapped_column(Text, nullable=False)
+
 class Summary(Base):
     __tablename__ = "summary"
     __table_args__ = (UniqueConstraint("course_id", "summary_length", name="uq_course_summary"),)
@@ -41,6 +71,17 @@ class Summary(Base):
     summary_length: Mapped[str] = mapped_column(String(20), nullable=False)  # short|medium|long
     summary_content: Mapped[str] = mapped_column(Text, nullable=False)
 
+class SummaryPartial(Base):
+    """Length-independent map/reduce partial summary (services/summarizer.py), keyed by a hash of its input."""
+    __tablename__ = "summary_partials"
+    __table_args__ = (UniqueConstraint("course_id", "level", "input_hash", name="uq_summary_partial"),)
+
+    partial_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    course_id: Mapped[int] = mapped_column(Integer, ForeignKey("courses.course_id", ondelete="CASCADE"), nullable=False)
+    level: Mapped[int] = mapped_column(Integer, nullable=False)  # 0 = map over chunks, 1.. = reduce stages
+    input_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    partial_text: Mapped[str] = mapped_column(Text, nullable=False)
+
 class Flashcard(Base):
     __tablename__ = "flashcards"
     __table_args__ = (UniqueConstraint("course_id", "card_index", name="uq_course_card_slot"),)
@@ -55,6 +96,8 @@ class Flashcard(Base):
 
 class Quiz(Base):
     __tablename__ = "quizzes"
+    # keyset pages of GET /courses/{course_id}/quizzes, newest first
+    __table_args__ = (Index("ix_quizzes_course_created", "course_id", "created_at", "quiz_id"),)
 
     quiz_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     course_id: Mapped[int] = mapped_column(
@@ -86,8 +129,223 @@ class QuizQuestion(Base):
     student_selected_index: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
 
+class SummaryTranslation(Base):
+    """A stored summary translated into one language (services/artifact_translations.py)."""
+    __tablename__ = "summary_translations"
+    __table_args__ = (UniqueConstraint("summary_id", "language", name="uq_summary_translation"),)
+
+    translation_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    summary_id: Mapped[int] = mapped_column(Integer, ForeignKey("summary.summary_id", ondelete="CASCADE"), nullable=False)
+    language: Mapped[str] = mapped_column(String(64), nullable=False)  # normalized, e.g. "spanish"
+    source_hash: Mapped[str] = mapped_column(String(64), nullable=False)  # of the source text it was made from
+    summary_content: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+class FlashcardTranslation(Base):
+    __tablename__ = "flashcard_translations"
+    __table_args__ = (UniqueConstraint("flashcard_id", "language", name="uq_flashcard_translation"),)
+
+    translation_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    flashcard_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("flashcards.flashcard_id", ondelete="CASCADE"), nullable=False
+    )
+    language: Mapped[str] = mapped_column(String(64), nullable=False)
+    source_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    front_text: Mapped[str] = mapped_column(Text, nullable=False)
+    back_text: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+class QuizQuestionTranslation(Base):
+    __tablename__ = "quiz_question_translations"
+    __table_args__ = (UniqueConstraint("question_id", "language", name="uq_quiz_question_translation"),)
+
+    translation_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    question_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("quiz_questions.question_id", ondelete="CASCADE"), nullable=False
+    )
+    language: Mapped[str] = mapped_column(String(64), nullable=False)
+    source_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    question_text: Mapped[str] = mapped_column(Text, nullable=False)
+    options_json: Mapped[str] = mapped_column(Text, nullable=False)  # JSON array of 4 strings
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class AudioPackItem(Base):
+    """One audio file of a course's offline audio pack (apis/audio_pack_api.py)."""
+    __tablename__ = "audio_pack_items"
+    __table_args__ = (UniqueConstraint("course_id", "item_key", name="uq_audio_pack_item"),)
+
+    item_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    course_id: Mapped[int] = mapped_column(Integer, ForeignKey("courses.course_id", ondelete="CASCADE"), nullable=False)
+    item_key: Mapped[str] = mapped_column(String(64), nullable=False)  # e.g. flashcard-03-front, summary-short
+    position: Mapped[int] = mapped_column(Integer, nullable=False)  # playlist order
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+    text_hash: Mapped[str] = mapped_column(String(64), nullable=False)  # tts_cache key of the spoken text
+    file_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    byte_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+
+class ChatDocument(Base):
+    """Text of a document uploaded to the chatbot (/upload_pdf); read back by services/context_store.py."""
+    __tablename__ = "chat_documents"
+
+    doc_id: Mapped[str] = mapped_column(String(32), primary_key=True)  # uuid4 hex
+    user_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("User.user_id", ondelete="CASCADE"), nullable=True, index=True
+    )
+    session_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+    content_length: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class ChatSession(Base):
+    """Server-side chatbot conversation; turns older than the kept window are folded into `summary`."""
+    __tablename__ = "chat_sessions"
+
+    chat_session_id: Mapped[str] = mapped_column(String(32), primary_key=True)  # uuid4 hex
+    user_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("User.user_id", ondelete="CASCADE"), nullable=True, index=True
+    )
+    doc_id: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    course_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("courses.course_id", ondelete="SET NULL"), nullable=True
+    )
+    summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    summarized_upto: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # last message_id in summary
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+
+    message_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    chat_session_id: Mapped[str] = mapped_column(
+        String(32), ForeignKey("chat_sessions.chat_session_id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    role: Mapped[str] = mapped_column(String(10), nullable=False)  # user | model
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+    token_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class Job(Base):
+    """Background generation job (services/jobs.py); rows outlive restarts and are re-queued on startup."""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # single-flight: at most one active job per dedupe_key, across all app processes
+        Index(
+            "uq_jobs_active_dedupe", "dedupe_key", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    job_id: Mapped[str] = mapped_column(String(32), primary_key=True)  # uuid4 hex
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)  # summary | flashcards | quiz
+    course_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    params_json: Mapped[str] = mapped_column(Text, nullable=False)
+    dedupe_key: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)  # sha256(kind, params)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="queued", index=True)  # queued | running | succeeded | failed
+    result_json: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # the endpoint's response dict
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class TranslationMemory(Base):
+    """Translated text segments (services/translation.py), reused across every translation request."""
+    __tablename__ = "translation_memory"
+
+    source_hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # sha256 of the source segment
+    target_language: Mapped[str] = mapped_column(String(64), primary_key=True)  # normalized, e.g. "spanish"
+    translated_text: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class LLMCacheEntry(Base):
+    """Persistent tier of the LLM response cache (services/llm_cache.py)."""
+    __tablename__ = "llm_cache"
+
+    cache_key: Mapped[str] = mapped_column(String(64), primary_key=True)  # sha256(provider, model, prompt, params)
+    provider: Mapped[str] = mapped_column(String(32), nullable=False)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    response_text: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+
+
+
+
+
+def _add_missing_columns(engine) -> None:
+    """create_all() never alters existing tables; add new nullable columns in place."""
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing or not col.nullable:
+                    continue
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{col.name}" {col_type}'))
+
+
+def _add_missing_indexes(engine) -> None:
+    """Likewise for indexes declared on tables that already existed."""
+    insp = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not table.indexes or not insp.has_table(table.name):
+            continue
+        existing = {ix["name"] for ix in insp.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(engine)
+
 
+def _add_name_search_index(engine) -> None:
+    """Trigram index behind case-insensitive course name search (Postgres with pg_trgm only)."""
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_courses_name_trgm ON courses USING gin (course_name gin_trgm_ops)"
+            ))
+    except Exception as e:  # e.g. no permission to create the extension: search still works, unindexed
+        print("Course name search index not created:", e)
 
 
 def init_models(engine) -> None:
     Base.metadata.create_all(engine)
+    _add_missing_columns(engine)
+    _add_missing_indexes(engine)
+    _add_name_search_index(engine)
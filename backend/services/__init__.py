@@ -0,0 +1,2 @@
+# backend/services/__init__.py
+# (shared helpers used by the apis/ modules; no routes live here)
@@ -0,0 +1,225 @@
+# backend/services/artifact_translations.py
+"""
+Stored translations of generated course artifacts: summaries, flashcards and
+quiz questions.
+
+An artifact is translated into a language once, with one batched Gemini call
+(services/translation.py, so the translation memory applies too), and the
+result is kept in summary_translations / flashcard_translations /
+quiz_question_translations. Every row records source_hash, a hash of the text
+it was made from; when the source is regenerated the hashes stop matching and
+only the changed items are translated again on the next read.
+"""
+import hashlib
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models import (
+    Flashcard,
+    FlashcardTranslation,
+    QuizQuestion,
+    QuizQuestionTranslation,
+    Summary,
+    SummaryTranslation,
+)
+from services.translation import normalize_language, split_segments, translate_segments
+
+_SESSION_FACTORY: Optional[Callable[[], Session]] = None
+def set_session_factory_for_artifact_translations(factory: Callable[[], Session]) -> None:
+    global _SESSION_FACTORY
+    _SESSION_FACTORY = factory
+
+# (source row id, source fields, stored source_hash, stored translated fields)
+_Item = Tuple[int, List[str], Optional[str], Optional[List[str]]]
+
+
+def source_hash(fields: List[str]) -> str:
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+async def _translate_items(items: List[_Item], language: str,
+                           refresh: bool) -> Tuple[Dict[int, List[str]], Dict[int, List[str]]]:
+    """Translated fields for every item, and the subset that was (re)translated and needs storing."""
+    out: Dict[int, List[str]] = {}
+    stale: List[Tuple[int, List[str]]] = []
+    for item_id, fields, stored_hash, stored in items:
+        if not refresh and stored is not None and stored_hash == source_hash(fields):
+            out[item_id] = stored
+        else:
+            stale.append((item_id, fields))
+    if not stale:
+        return out, {}
+
+    # every field keeps its line structure; all segments of the artifact go in one call
+    pieces = [split_segments(f) for _, fields in stale for f in fields]
+    translated = iter(await translate_segments(
+        [s for p in pieces for s in p[0::2]], language, refresh=refresh, single_batch=True
+    ))
+    texts = []
+    for p in pieces:
+        p[0::2] = [next(translated) for _ in p[0::2]]
+        texts.append("".join(p).strip())
+
+    fresh: Dict[int, List[str]] = {}
+    it = iter(texts)
+    for item_id, fields in stale:
+        fresh[item_id] = [next(it) for _ in fields]
+        if any(f.strip() and not t for f, t in zip(fields, fresh[item_id])):
+            raise ValueError("Empty translation returned")
+    out.update(fresh)
+    return out, fresh
+
+
+# --- summary ---
+def _load_summary(course_id: int, summary_length: str, language: str) -> Optional[Tuple[int, _Item]]:
+    with _SESSION_FACTORY() as db:
+        row = db.execute(
+            select(Summary.summary_id, Summary.summary_content, SummaryTranslation.source_hash,
+                   SummaryTranslation.summary_content)
+            .outerjoin(SummaryTranslation, (SummaryTranslation.summary_id == Summary.summary_id)
+                       & (SummaryTranslation.language == language))
+            .where(Summary.course_id == course_id, Summary.summary_length == summary_length)
+        ).one_or_none()
+    if row is None:
+        return None
+    return row[0], (row[0], [row[1]], row[2], [row[3]] if row[3] is not None else None)
+
+def _store_summary(summary_id: int, language: str, source: List[str], translated: List[str]) -> None:
+    with _SESSION_FACTORY() as db:
+        stmt = pg_insert(SummaryTranslation).values(
+            summary_id=summary_id, language=language, source_hash=source_hash(source),
+            summary_content=translated[0],
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["summary_id", "language"],
+            set_={"source_hash": stmt.excluded.source_hash, "summary_content": stmt.excluded.summary_content},
+        ))
+        db.commit()
+
+async def summary_translation(course_id: int, summary_length: str, target_language: str,
+                              refresh: bool = False) -> Optional[dict]:
+    """The (course_id, summary_length) summary in target_language; None when no summary is stored."""
+    language = normalize_language(target_language)
+    loaded = await run_in_threadpool(_load_summary, course_id, summary_length, language)
+    if loaded is None:
+        return None
+    summary_id, item = loaded
+    out, fresh = await _translate_items([item], target_language, refresh)
+    if fresh:
+        await run_in_threadpool(_store_summary, summary_id, language, item[1], fresh[summary_id])
+    return {
+        "summary_id": summary_id,
+        "course_id": course_id,
+        "summary_length": summary_length,
+        "language": language,
+        "summary_content": out[summary_id][0],
+    }
+
+
+# --- flashcards ---
+def _load_flashcards(course_id: int, language: str) -> List[Tuple[int, _Item]]:
+    with _SESSION_FACTORY() as db:
+        rows = db.execute(
+            select(Flashcard.flashcard_id, Flashcard.card_index, Flashcard.front_text, Flashcard.back_text,
+                   FlashcardTranslation.source_hash, FlashcardTranslation.front_text,
+                   FlashcardTranslation.back_text)
+            .outerjoin(FlashcardTranslation, (FlashcardTranslation.flashcard_id == Flashcard.flashcard_id)
+                       & (FlashcardTranslation.language == language))
+            .where(Flashcard.course_id == course_id)
+            .order_by(Flashcard.card_index.asc())
+        ).all()
+    return [
+        (r[1], (r[0], [r[2], r[3]], r[4], [r[5], r[6]] if r[4] is not None else None))
+        for r in rows
+    ]
+
+def _store_flashcards(language: str, rows: List[dict]) -> None:
+    with _SESSION_FACTORY() as db:
+        stmt = pg_insert(FlashcardTranslation).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["flashcard_id", "language"],
+            set_={"source_hash": stmt.excluded.source_hash, "front_text": stmt.excluded.front_text,
+                  "back_text": stmt.excluded.back_text},
+        ))
+        db.commit()
+
+async def flashcard_translations(course_id: int, target_language: str, refresh: bool = False) -> List[dict]:
+    """The course's flashcards in target_language, ordered by card_index ([] when it has none)."""
+    language = normalize_language(target_language)
+    loaded = await run_in_threadpool(_load_flashcards, course_id, language)
+    if not loaded:
+        return []
+    items = [item for _, item in loaded]
+    out, fresh = await _translate_items(items, target_language, refresh)
+    if fresh:
+        sources = {item[0]: item[1] for item in items}
+        await run_in_threadpool(_store_flashcards, language, [
+            {"flashcard_id": fid, "language": language, "source_hash": source_hash(sources[fid]),
+             "front_text": fields[0], "back_text": fields[1]}
+            for fid, fields in fresh.items()
+        ])
+    return [
+        {"flashcard_id": item[0], "card_index": card_index, "language": language,
+         "front_text": out[item[0]][0], "back_text": out[item[0]][1]}
+        for card_index, item in loaded
+    ]
+
+
+# --- quiz questions ---
+def _load_quiz(quiz_id: int, language: str) -> List[Tuple[tuple, _Item]]:
+    with _SESSION_FACTORY() as db:
+        rows = db.execute(
+            select(QuizQuestion.question_id, QuizQuestion.question_index, QuizQuestion.question_type,
+                   QuizQuestion.correct_index, QuizQuestion.student_selected_index,
+                   QuizQuestion.question_text, QuizQuestion.options_json,
+                   QuizQuestionTranslation.source_hash, QuizQuestionTranslation.question_text,
+                   QuizQuestionTranslation.options_json)
+            .outerjoin(QuizQuestionTranslation, (QuizQuestionTranslation.question_id == QuizQuestion.question_id)
+                       & (QuizQuestionTranslation.language == language))
+            .where(QuizQuestion.quiz_id == quiz_id)
+            .order_by(QuizQuestion.question_index.asc())
+        ).all()
+    loaded = []
+    for r in rows:
+        try:
+            options = [str(o) for o in json.loads(r[6])]
+        except Exception:
+            options = []
+        stored = [r[8], *json.loads(r[9])] if r[7] is not None else None
+        loaded.append(((r[1], r[2], r[3], r[4]), (r[0], [r[5], *options], r[7], stored)))
+    return loaded
+
+def _store_quiz(rows: List[dict]) -> None:
+    with _SESSION_FACTORY() as db:
+        stmt = pg_insert(QuizQuestionTranslation).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["question_id", "language"],
+            set_={"source_hash": stmt.excluded.source_hash, "question_text": stmt.excluded.question_text,
+                  "options_json": stmt.excluded.options_json},
+        ))
+        db.commit()
+
+async def quiz_translation(quiz_id: int, target_language: str, refresh: bool = False) -> List[dict]:
+    """The quiz's questions and options in target_language ([] when the quiz has no questions)."""
+    language = normalize_language(target_language)
+    loaded = await run_in_threadpool(_load_quiz, quiz_id, language)
+    if not loaded:
+        return []
+    items = [item for _, item in loaded]
+    out, fresh = await _translate_items(items, target_language, refresh)
+    if fresh:
+        sources = {item[0]: item[1] for item in items}
+        await run_in_threadpool(_store_quiz, [
+            {"question_id": qid, "language": language, "source_hash": source_hash(sources[qid]),
+             "question_text": fields[0], "options_json": json.dumps(fields[1:], ensure_ascii=False)}
+            for qid, fields in fresh.items()
+        ])
+    return [
+        {"question_index": idx, "type": qtype, "question": out[item[0]][0], "options": out[item[0]][1:],
+         "correct_index": ci, "student_selected_index": sel}
+        for (idx, qtype, ci, sel), item in loaded
+    ]
@@ -0,0 +1,135 @@
+# backend/services/chat_sessions.py
+"""
+Server-side chatbot conversations.
+
+The client sends only chat_session_id and the new message; the history sent to
+Gemini is the session's running summary plus the turns after it. Once those
+turns pass CHAT_HISTORY_TOKENS, everything but the last CHAT_KEEP_MESSAGES
+messages is folded into the summary (one extra model call, made after the
+reply has been sent), so prompt size per turn stays flat however long the
+study session runs. All state is in chat_sessions / chat_messages, so any
+worker can serve any turn.
+"""
+import os
+import uuid
+from typing import Callable, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models import ChatMessage, ChatSession
+from services.course_chunks import approx_tokens
+from services.llm_clients import gemini_model
+
+load_dotenv()
+
+# Token budget of verbatim history before older turns are summarized
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", "2000"))
+# Most recent messages (user + model) that are always kept verbatim
+CHAT_KEEP_MESSAGES = int(os.getenv("CHAT_KEEP_MESSAGES", "6"))
+CHAT_SUMMARY_MODEL = "models/gemini-2.5-flash"
+
+_SESSION_FACTORY: Optional[Callable[[], Session]] = None
+def set_session_factory_for_chat_sessions(factory: Callable[[], Session]) -> None:
+    global _SESSION_FACTORY
+    _SESSION_FACTORY = factory
+
+
+def create_session(user_id: Optional[int] = None, doc_id: Optional[str] = None,
+                   course_id: Optional[int] = None) -> str:
+    chat_session_id = uuid.uuid4().hex
+    with _SESSION_FACTORY() as db:
+        db.add(ChatSession(chat_session_id=chat_session_id, user_id=user_id, doc_id=doc_id, course_id=course_id))
+        db.commit()
+    return chat_session_id
+
+def load_session(chat_session_id: str, user_id: Optional[int] = None) -> Optional[dict]:
+    """Session context and the turns not yet in its summary; None when missing or owned by another user."""
+    session = _load(chat_session_id)
+    if session is None or (session["user_id"] is not None and session["user_id"] != user_id):
+        return None
+    return session
+
+def _load(chat_session_id: str) -> Optional[dict]:
+    with _SESSION_FACTORY() as db:
+        s = db.get(ChatSession, chat_session_id)
+        if s is None:
+            return None
+        rows = db.execute(
+            select(ChatMessage.message_id, ChatMessage.role, ChatMessage.content, ChatMessage.token_count)
+            .where(ChatMessage.chat_session_id == chat_session_id, ChatMessage.message_id > s.summarized_upto)
+            .order_by(ChatMessage.message_id)
+        ).all()
+        return {
+            "chat_session_id": s.chat_session_id,
+            "user_id": s.user_id,
+            "doc_id": s.doc_id,
+            "course_id": s.course_id,
+            "summary": s.summary,
+            "summarized_upto": s.summarized_upto,
+            "messages": [{"message_id": r[0], "role": r[1], "content": r[2], "tokens": r[3]} for r in rows],
+        }
+
+def gemini_history(session: dict) -> List[dict]:
+    history: List[dict] = []
+    if session["summary"]:
+        history.append({"role": "user", "parts": [f"Summary of our conversation so far:\n{session['summary']}"]})
+        history.append({"role": "model", "parts": ["Understood. I will keep that in mind."]})
+    history.extend({"role": m["role"], "parts": [m["content"]]} for m in session["messages"])
+    return history
+
+def append_turn(chat_session_id: str, message: str, answer: str) -> None:
+    with _SESSION_FACTORY() as db:
+        db.add(ChatMessage(chat_session_id=chat_session_id, role="user", content=message,
+                           token_count=approx_tokens(message)))
+        db.add(ChatMessage(chat_session_id=chat_session_id, role="model", content=answer,
+                           token_count=approx_tokens(answer)))
+        db.commit()
+
+def list_messages(chat_session_id: str, user_id: Optional[int] = None) -> Optional[List[dict]]:
+    with _SESSION_FACTORY() as db:
+        s = db.get(ChatSession, chat_session_id)
+        if s is None or (s.user_id is not None and s.user_id != user_id):
+            return None
+        rows = db.execute(
+            select(ChatMessage.role, ChatMessage.content, ChatMessage.created_at)
+            .where(ChatMessage.chat_session_id == chat_session_id)
+            .order_by(ChatMessage.message_id)
+        ).all()
+    return [{"role": r[0], "content": r[1], "created_at": r[2].isoformat() if r[2] else None} for r in rows]
+
+
+def _store_summary(chat_session_id: str, expected_upto: int, summary: str, upto: int) -> None:
+    with _SESSION_FACTORY() as db:
+        # conditional: a concurrent compaction of the same turns wins once
+        db.execute(
+            update(ChatSession)
+            .where(ChatSession.chat_session_id == chat_session_id, ChatSession.summarized_upto == expected_upto)
+            .values(summary=summary, summarized_upto=upto)
+        )
+        db.commit()
+
+async def compact(chat_session_id: str) -> None:
+    """Fold old turns into the running summary once the verbatim history is over budget."""
+    session = await run_in_threadpool(_load, chat_session_id)
+    if session is None:
+        return
+    messages = session["messages"]
+    if len(messages) <= CHAT_KEEP_MESSAGES or sum(m["tokens"] for m in messages) <= CHAT_HISTORY_TOKENS:
+        return
+
+    old = messages[:len(messages) - CHAT_KEEP_MESSAGES]
+    transcript = "\n".join(f"{'Student' if m['role'] == 'user' else 'Tutor'}: {m['content']}" for m in old)
+    prompt = (
+        "You maintain a running summary of a study conversation between a student and a tutor. "
+        "Update the summary with the new turns below. Keep the topics covered, facts and answers the "
+        "student was given, open questions and the student's preferences. At most 200 words.\n\n"
+        f"Current summary:\n{session['summary'] or '(none)'}\n\nNew turns:\n{transcript}"
+    )
+    resp = await gemini_model(CHAT_SUMMARY_MODEL).generate_content_async(prompt)
+    summary = (resp.text or "").strip()
+    if summary:
+        await run_in_threadpool(_store_summary, chat_session_id, session["summarized_upto"], summary,
+                                old[-1]["message_id"])
@@ -0,0 +1,153 @@
+# backend/services/context_store.py
+"""
+Chat context store: the documents a user (or an anonymous browser session)
+uploaded to the chatbot, keyed by doc_id.
+
+Texts live in the chat_documents table, so every uvicorn worker can serve every
+chat turn; recently used texts are also kept in a per-process LRU bounded by
+CONTEXT_CACHE_MAX_MB of UTF-8 text. A document is only handed back to the
+user_id / session_id it was uploaded under. Chats about a course read the
+Course's stored chunks directly instead of a re-upload.
+
+Each chat turn gets the passages most relevant to the question: a document is
+chunked and BM25-indexed once (kept for CHAT_DOC_INDEX_CACHE_SIZE documents
+per process), courses use their stored index (services/course_chunks.py).
+"""
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import ChatDocument
+from services.course_chunks import build_chunks, course_context, join_with_gaps, text_units
+from services.retrieval import BM25Index, select_chunks
+
+load_dotenv()
+
+CONTEXT_CACHE_MAX_MB = int(os.getenv("CONTEXT_CACHE_MAX_MB", "64"))
+CHAT_DOC_INDEX_CACHE_SIZE = int(os.getenv("CHAT_DOC_INDEX_CACHE_SIZE", "32"))
+
+_SESSION_FACTORY: Optional[Callable[[], Session]] = None
+def set_session_factory_for_context_store(factory: Callable[[], Session]) -> None:
+    global _SESSION_FACTORY
+    _SESSION_FACTORY = factory
+
+# doc_id -> (user_id, session_id, text)
+_CACHE: "OrderedDict[str, Tuple[Optional[int], Optional[str], str]]" = OrderedDict()
+_CACHE_BYTES = 0
+# doc_id -> (chunk (start, end) offsets, index)
+_INDEXES: "OrderedDict[str, Tuple[List[Tuple[int, int]], BM25Index]]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def _size(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+def _remember(doc_id: str, user_id: Optional[int], session_id: Optional[str], text: str) -> None:
+    global _CACHE_BYTES
+    size = _size(text)
+    limit = CONTEXT_CACHE_MAX_MB * 1024 * 1024
+    if size > limit:
+        return
+    with _LOCK:
+        old = _CACHE.pop(doc_id, None)
+        if old is not None:
+            _CACHE_BYTES -= _size(old[2])
+        _CACHE[doc_id] = (user_id, session_id, text)
+        _CACHE_BYTES += size
+        while _CACHE_BYTES > limit:
+            _, (_, _, evicted) = _CACHE.popitem(last=False)
+            _CACHE_BYTES -= _size(evicted)
+
+def _allowed(owner_user: Optional[int], owner_session: Optional[str],
+             user_id: Optional[int], session_id: Optional[str]) -> bool:
+    if owner_user is not None:
+        return owner_user == user_id
+    return owner_session is None or owner_session == session_id
+
+
+def save_document(filename: str, sha256: str, text: str,
+                  user_id: Optional[int] = None, session_id: Optional[str] = None) -> str:
+    """Store an uploaded document's text; the same file re-uploaded by the same owner keeps its doc_id."""
+    with _SESSION_FACTORY() as db:
+        doc_id = db.execute(
+            select(ChatDocument.doc_id).where(
+                ChatDocument.sha256 == sha256,
+                ChatDocument.user_id.is_(None) if user_id is None else ChatDocument.user_id == user_id,
+                ChatDocument.session_id.is_(None) if session_id is None else ChatDocument.session_id == session_id,
+            ).limit(1)
+        ).scalar_one_or_none()
+        if doc_id is None:
+            doc_id = uuid.uuid4().hex
+            db.add(ChatDocument(doc_id=doc_id, user_id=user_id, session_id=session_id, filename=filename[:255],
+                                sha256=sha256, content=text, content_length=len(text)))
+            db.commit()
+    _remember(doc_id, user_id, session_id, text)
+    return doc_id
+
+def load_document(doc_id: str, user_id: Optional[int] = None, session_id: Optional[str] = None) -> Optional[str]:
+    """The document's text, or None when it does not exist or belongs to someone else."""
+    with _LOCK:
+        hit = _CACHE.get(doc_id)
+        if hit is not None:
+            _CACHE.move_to_end(doc_id)
+    if hit is None:
+        with _SESSION_FACTORY() as db:
+            row = db.execute(
+                select(ChatDocument.user_id, ChatDocument.session_id, ChatDocument.content)
+                .where(ChatDocument.doc_id == doc_id)
+            ).one_or_none()
+        if row is None:
+            return None
+        hit = (row[0], row[1], row[2])
+        _remember(doc_id, *hit)
+    owner_user, owner_session, text = hit
+    return text if _allowed(owner_user, owner_session, user_id, session_id) else None
+
+def latest_document_id(user_id: Optional[int] = None, session_id: Optional[str] = None) -> Optional[str]:
+    """Most recent upload of this user (or anonymous session); None for fully anonymous callers."""
+    if user_id is None and session_id is None:
+        return None
+    stmt = select(ChatDocument.doc_id)
+    if user_id is not None:
+        stmt = stmt.where(ChatDocument.user_id == user_id)
+    else:
+        stmt = stmt.where(ChatDocument.user_id.is_(None), ChatDocument.session_id == session_id)
+    with _SESSION_FACTORY() as db:
+        return db.execute(stmt.order_by(ChatDocument.created_at.desc()).limit(1)).scalar_one_or_none()
+
+def _document_index(doc_id: str, text: str) -> Tuple[List[Tuple[int, int]], BM25Index]:
+    with _LOCK:
+        hit = _INDEXES.get(doc_id)
+        if hit is not None:
+            _INDEXES.move_to_end(doc_id)
+            return hit
+    chunks = build_chunks(text, text_units(text))
+    entry = (
+        [(c["char_start"], c["char_end"]) for c in chunks],
+        BM25Index.build([c["content"] for c in chunks], [c["token_count"] for c in chunks]),
+    )
+    with _LOCK:
+        _INDEXES[doc_id] = entry
+        while len(_INDEXES) > CHAT_DOC_INDEX_CACHE_SIZE:
+            _INDEXES.popitem(last=False)
+    return entry
+
+def document_context(doc_id: str, query: str, token_budget: int,
+                     user_id: Optional[int] = None, session_id: Optional[str] = None) -> str:
+    """Passages of the document most relevant to `query` that fit token_budget ("" when not readable)."""
+    text = load_document(doc_id, user_id, session_id)
+    if not text:
+        return ""
+    offsets, index = _document_index(doc_id, text)
+    chosen = select_chunks(index, query, token_budget)
+    return join_with_gaps([(i, text[offsets[i][0]:offsets[i][1]]) for i in chosen])
+
+def course_passages(course_id: int, query: str, token_budget: int) -> str:
+    with _SESSION_FACTORY() as db:
+        return course_context(db, course_id, query, token_budget)
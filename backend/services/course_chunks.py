@@ -0,0 +1,253 @@
+# backend/services/course_chunks.py
+"""
+Course content chunking.
+
+At ingest the combined course text is cut into contiguous CourseChunk rows on
+file and page/slide/paragraph boundaries, so chunk contents concatenated in
+chunk_index order are exactly Course.course_content. Readers fetch only the
+chunks they need instead of loading the whole course_content blob. Courses
+stored before chunking existed are chunked lazily on first read.
+
+A BM25 index over the chunks (CourseTermIndex) is built in the same step, and
+course_context() uses it to fill a prompt's token budget with the most
+relevant chunks of the whole course.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Course, CourseChunk, CourseTermIndex
+from services.extraction import ExtractedFile
+from services.retrieval import BM25Index, select_chunks
+
+load_dotenv()
+
+# Soft size of one chunk; pages/slides are merged up to this and split beyond it
+COURSE_CHUNK_CHARS = int(os.getenv("COURSE_CHUNK_CHARS", "2000"))
+
+# Parsed indexes kept per process (courses never change after ingest)
+COURSE_INDEX_CACHE_SIZE = int(os.getenv("COURSE_INDEX_CACHE_SIZE", "32"))
+
+_FILE_HEADER = re.compile(r"^=== FILE: (.*) ===$", re.M)
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+class _Unit(NamedTuple):
+    start: int  # offset in the combined content
+    source: Optional[str]
+    unit_type: str
+    number: int
+
+
+def approx_tokens(text: str) -> int:
+    return (len(text) + 3) // 4  # ~4 characters per token for English prose
+
+def combine_files(files: Sequence[ExtractedFile]) -> Tuple[str, List[_Unit]]:
+    """The text /addcourse has always stored for these files, plus where each page/slide/paragraph starts in it."""
+    blocks: List[str] = []
+    units: List[_Unit] = []
+    pos = 0
+    for f in files:
+        if blocks:
+            pos += 2  # "\n\n" between file blocks
+        header = f"=== FILE: {f.stem} ===\n"
+        raw = "\n".join(f.parts)
+        body = raw.strip()
+        lead = len(raw) - len(raw.lstrip())
+        body_start = pos + len(header)
+
+        first = True
+        offset = 0
+        for n, part in enumerate(f.parts, start=1):
+            rel = offset - lead  # where this part starts inside `body`
+            offset += len(part) + 1
+            if rel + len(part) <= 0:
+                continue  # whitespace swallowed by strip()
+            if rel >= len(body):
+                break
+            units.append(_Unit(pos if first else body_start + max(rel, 0), f.stem, f.unit_type, n))
+            first = False
+
+        blocks.append(header + body)
+        pos = body_start + len(body)
+    return "\n\n".join(blocks), units
+
+def text_units(content: str) -> List[_Unit]:
+    """Paragraph units for raw text; understands the '=== FILE: x ===' headers of older combined courses."""
+    if not content:
+        return []
+    units: List[_Unit] = []
+    headers = {m.start(): m.group(1) for m in _FILE_HEADER.finditer(content)}
+    source: Optional[str] = None
+    number = 0
+    starts = [0] + [m.end() for m in _PARAGRAPH_BREAK.finditer(content)] + sorted(headers)
+    for start in sorted(set(starts)):
+        if start >= len(content):
+            continue
+        if start in headers:
+            source, number = headers[start], 0
+        number += 1
+        units.append(_Unit(start, source, "text" if source is None else "paragraph", number))
+    return units
+
+def _split_long(content: str, start: int, end: int, target: int) -> List[Tuple[int, int]]:
+    out: List[Tuple[int, int]] = []
+    while end - start > target:
+        cut = max(content.rfind("\n", start + 1, start + target), content.rfind(" ", start + 1, start + target))
+        if cut <= start:
+            cut = start + target
+        out.append((start, cut))
+        start = cut
+    out.append((start, end))
+    return out
+
+def build_chunks(content: str, units: Sequence[_Unit], target: int = COURSE_CHUNK_CHARS) -> List[dict]:
+    """Greedily merge consecutive units of the same file into chunks of about `target` characters."""
+    if not units:
+        return []
+    bounds = [0] + [u.start for u in units[1:]] + [len(content)]
+    chunks: List[dict] = []
+    cur: Optional[dict] = None
+    for i, u in enumerate(units):
+        for s, e in _split_long(content, bounds[i], bounds[i + 1], target):
+            if cur and cur["source_name"] == u.source and e - cur["char_start"] <= target:
+                cur["char_end"] = e
+                cur["unit_end"] = u.number
+                continue
+            if cur:
+                chunks.append(cur)
+            cur = {
+                "source_name": u.source,
+                "unit_type": u.unit_type,
+                "unit_start": u.number,
+                "unit_end": u.number,
+                "char_start": s,
+                "char_end": e,
+            }
+    chunks.append(cur)
+    for idx, c in enumerate(chunks):
+        c["chunk_index"] = idx
+        c["content"] = content[c["char_start"]:c["char_end"]]
+        c["token_count"] = approx_tokens(c["content"])
+    return chunks
+
+
+# --- DB helpers (caller owns the session) ---
+_INDEX_CACHE: "OrderedDict[int, BM25Index]" = OrderedDict()
+_INDEX_LOCK = threading.Lock()
+
+def _remember_index(course_id: int, index: BM25Index) -> None:
+    with _INDEX_LOCK:
+        _INDEX_CACHE[course_id] = index
+        _INDEX_CACHE.move_to_end(course_id)
+        while len(_INDEX_CACHE) > COURSE_INDEX_CACHE_SIZE:
+            _INDEX_CACHE.popitem(last=False)
+
+def _insert_chunks(db: Session, course_id: int, chunks: List[dict]) -> None:
+    if chunks:
+        db.execute(insert(CourseChunk), [{"course_id": course_id, **c} for c in chunks])
+    index = BM25Index.build([c["content"] for c in chunks], [c["token_count"] for c in chunks])
+    db.add(CourseTermIndex(course_id=course_id, index_json=index.to_json()))
+
+def store_course(db: Session, name: str, user_id: Optional[int], content: str, units: Sequence[_Unit]) -> int:
+    """Add the course, its chunks and their BM25 index; the caller commits."""
+    row = Course(course_name=name, course_content=content, content_length=len(content), user_id=user_id)
+    db.add(row)
+    db.flush()
+    _insert_chunks(db, row.course_id, build_chunks(content, units))
+    return row.course_id
+
+def ensure_chunks(db: Session, course_id: int) -> None:
+    """Backfill chunks, index and content_length for a course stored before chunking existed."""
+    if db.execute(select(CourseChunk.chunk_id).where(CourseChunk.course_id == course_id).limit(1)).first():
+        return
+    content = db.execute(select(Course.course_content).where(Course.course_id == course_id)).scalar_one_or_none()
+    if content is None:
+        return
+    try:
+        _insert_chunks(db, course_id, build_chunks(content, text_units(content)))
+        db.execute(update(Course).where(Course.course_id == course_id).values(content_length=len(content)))
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # another request backfilled it first
+
+def load_course_text(db: Session, course_id: int, max_chars: Optional[int] = None) -> str:
+    """course_content[:max_chars], read from only the chunks that overlap that prefix."""
+    stmt = select(CourseChunk.content).where(CourseChunk.course_id == course_id).order_by(CourseChunk.chunk_index)
+    if max_chars is not None:
+        stmt = stmt.where(CourseChunk.char_start < max_chars)
+    parts = db.execute(stmt).scalars().all()
+    if not parts:
+        ensure_chunks(db, course_id)
+        parts = db.execute(stmt).scalars().all()
+    text = "".join(parts)
+    return text[:max_chars] if max_chars is not None else text
+
+def load_index(db: Session, course_id: int) -> Optional[BM25Index]:
+    with _INDEX_LOCK:
+        index = _INDEX_CACHE.get(course_id)
+        if index is not None:
+            _INDEX_CACHE.move_to_end(course_id)
+            return index
+
+    stmt = select(CourseTermIndex.index_json).where(CourseTermIndex.course_id == course_id)
+    raw = db.execute(stmt).scalar_one_or_none()
+    if raw is None:
+        ensure_chunks(db, course_id)
+        raw = db.execute(stmt).scalar_one_or_none()
+    if raw is not None:
+        index = BM25Index.from_json(raw)
+    else:
+        # chunked before indexes existed: build from the stored chunks
+        rows = db.execute(
+            select(CourseChunk.content, CourseChunk.token_count)
+            .where(CourseChunk.course_id == course_id)
+            .order_by(CourseChunk.chunk_index)
+        ).all()
+        if not rows:
+            return None
+        index = BM25Index.build([r.content for r in rows], [r.token_count for r in rows])
+        try:
+            db.add(CourseTermIndex(course_id=course_id, index_json=index.to_json()))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+    _remember_index(course_id, index)
+    return index
+
+def course_context(db: Session, course_id: int, query: str, token_budget: int, spread: bool = False) -> str:
+    """
+    The best chunks of the course for `query` that fit token_budget, in reading
+    order (the whole course when it fits). Skipped stretches are marked "[...]".
+    An empty query ranks chunks by the course's own salient terms.
+    """
+    index = load_index(db, course_id)
+    if index is None or not index.n_docs:
+        return ""
+    query = query.strip() or " ".join(index.salient_terms())
+    chosen = select_chunks(index, query, token_budget, spread=spread)
+    rows = db.execute(
+        select(CourseChunk.chunk_index, CourseChunk.content)
+        .where(CourseChunk.course_id == course_id, CourseChunk.chunk_index.in_(chosen))
+        .order_by(CourseChunk.chunk_index)
+    ).all()
+
+    return join_with_gaps(rows)
+
+def join_with_gaps(rows: Sequence[Tuple[int, str]]) -> str:
+    """Join (chunk_index, content) pairs in order, marking skipped stretches with "[...]"."""
+    out: List[str] = []
+    prev = -1
+    for idx, content in rows:
+        if out and idx != prev + 1:
+            out.append("\n[...]\n")
+        out.append(content)
+        prev = idx
+    return "".join(out).strip()
@@ -0,0 +1,103 @@
+# backend/services/extract_cache.py
+"""
+Content-addressed cache of extracted text (JSON list of pages/paragraphs/slides).
+
+Key = sha256(upload bytes) + parser name + PARSER_VERSION, so re-uploading the
+same syllabus skips parsing entirely. Entries are plain UTF-8 files in
+EXTRACT_CACHE_DIR; the directory is kept under EXTRACT_CACHE_MAX_MB by evicting
+the least recently used files (mtime is bumped on every hit). Writes go through
+os.replace, so several uvicorn workers can share one directory.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Bump when parser output changes so stale entries stop matching
+PARSER_VERSION = "2"
+
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "studypal-extract-cache")
+EXTRACT_CACHE_MAX_MB = int(os.getenv("EXTRACT_CACHE_MAX_MB", "256"))
+
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def cache_key(content_sha256: str, parser: str) -> str:
+    return hashlib.sha256(f"{content_sha256}:{parser}:{PARSER_VERSION}".encode()).hexdigest()
+
+def _path(key: str) -> str:
+    return os.path.join(EXTRACT_CACHE_DIR, key[:2], key + ".txt")
+
+def _count(name: str, n: int = 1) -> None:
+    with _LOCK:
+        _STATS[name] += n
+
+def get(key: str) -> Optional[str]:
+    path = _path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        os.utime(path)  # LRU: mark as recently used
+    except OSError:
+        _count("misses")
+        return None
+    _count("hits")
+    return text
+
+def put(key: str, text: str) -> None:
+    path = _path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return
+    _count("stores")
+    _evict()
+
+def _evict() -> None:
+    limit = EXTRACT_CACHE_MAX_MB * 1024 * 1024
+    entries = []
+    total = 0
+    for root, _, files in os.walk(EXTRACT_CACHE_DIR):
+        for name in files:
+            if not name.endswith(".txt"):
+                continue
+            p = os.path.join(root, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+    if total <= limit:
+        return
+    entries.sort()  # oldest first
+    for _, size, p in entries:
+        if total <= limit:
+            break
+        try:
+            os.remove(p)
+        except OSError:
+            continue
+        total -= size
+        _count("evictions")
+
+def stats() -> dict:
+    with _LOCK:
+        out = dict(_STATS)
+    lookups = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else 0.0
+    return out
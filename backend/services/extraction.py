@@ -0,0 +1,249 @@
+# backend/services/extraction.py
+"""
+Document text extraction engine.
+
+Parsing PDF/DOCX/PPTX is CPU-bound and blocking, so it never runs on the event
+loop: uploads arrive as temp files (services/uploads.py) and are parsed in a
+bounded process pool. Each file type has a registry of backends tried in order
+(see backend_chain); large PDFs are split into page ranges that run on several
+workers at once. Results are cached by content hash (services/extract_cache.py).
+Endpoints just `await extract_uploads(files)`.
+"""
+import asyncio
+import gc
+import json
+import os
+import pathlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+# File parsers
+import pdfplumber
+import pypdfium2 as pdfium
+from docx import Document as DocxDocument
+from pptx import Presentation
+from PyPDF2 import PdfReader
+
+from services import extract_cache
+from services.uploads import SpooledUpload
+
+load_dotenv()
+
+# Parser processes (0/unset -> number of CPUs, capped at 4)
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "0") or 0) or min(4, os.cpu_count() or 1)
+# PDFs longer than this are split into page ranges of this size
+PDF_PAGES_PER_TASK = max(1, int(os.getenv("PDF_PAGES_PER_TASK", "25")))
+# Recycle the pool once a worker's RSS passes this many MB (0 disables)
+EXTRACT_WORKER_MAX_RSS_MB = int(os.getenv("EXTRACT_WORKER_MAX_RSS_MB", "1024"))
+
+_POOL: Optional[ProcessPoolExecutor] = None
+
+
+class ExtractedFile(NamedTuple):
+    stem: str
+    unit_type: str  # page | paragraph | slide
+    parts: List[str]
+
+    @property
+    def text(self) -> str:
+        return join_parts(self.parts)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+    return _POOL
+
+def _recycle_pool() -> None:
+    """Swap in fresh workers; the old ones finish what they already have and exit."""
+    global _POOL
+    old, _POOL = _POOL, None
+    if old is not None:
+        old.shutdown(wait=False)
+
+
+def shutdown_pool() -> None:
+    """Called from the app lifespan on shutdown."""
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+
+
+# --- Backends (run inside worker processes; must stay module-level) ---
+# PDF backends take a page range so large files can be split across workers.
+def _read_pdf_pdfplumber(path: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    parts: List[str] = []
+    with pdfplumber.open(path) as pdf:
+        for p in pdf.pages[start:stop]:
+            parts.append(p.extract_text() or "")
+            p.close()  # drop this page's layout/char caches before the next one
+    return parts
+
+def _read_pdf_pypdfium2(path: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    parts: List[str] = []
+    pdf = pdfium.PdfDocument(path)
+    try:
+        for i in range(start, len(pdf) if stop is None else stop):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            parts.append(textpage.get_text_bounded().replace("\r\n", "\n"))
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+    return parts
+
+def _read_pdf_pypdf2(path: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    reader = PdfReader(path)
+    return [page.extract_text() or "" for page in reader.pages[start:stop]]
+
+def _pdf_page_count(path: str, backend: str) -> int:
+    """Page count read with the backend's own library, so a file only it can open still splits."""
+    if backend == "pdfplumber":
+        with pdfplumber.open(path) as pdf:
+            return len(pdf.pages)
+    if backend == "pypdf2":
+        return len(PdfReader(path).pages)
+    pdf = pdfium.PdfDocument(path)  # much cheaper to open than pdfplumber
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+def _read_docx(path: str) -> List[str]:
+    doc = DocxDocument(path)
+    return [p.text for p in doc.paragraphs]
+
+def _read_pptx(path: str) -> List[str]:
+    prs = Presentation(path)
+    return ["\n".join(shape.text for shape in slide.shapes if hasattr(shape, "text")) for slide in prs.slides]
+
+# ext -> {backend name: reader}
+BACKENDS: Dict[str, Dict[str, Callable[..., List[str]]]] = {
+    ".pdf": {
+        "pdfplumber": _read_pdf_pdfplumber,
+        "pypdfium2": _read_pdf_pypdfium2,
+        "pypdf2": _read_pdf_pypdf2,
+    },
+    ".docx": {"python-docx": _read_docx},
+    ".pptx": {"python-pptx": _read_pptx},
+}
+_PAGED_EXTS = (".pdf",)
+# What one entry of a backend's output list is; course chunks keep these boundaries
+UNIT_TYPES = {".pdf": "page", ".docx": "paragraph", ".pptx": "slide"}
+
+# Ordered fallback chain per type, e.g. EXTRACT_BACKENDS_PDF="pdfplumber,pypdf2".
+# The next backend is tried when the previous one returns no text or raises
+# (malformed files often break one parser but not another).
+# pypdfium2 leads for PDFs: ~100x pdfplumber's pages/sec at the same peak RSS
+# in bench/bench_backends.py.
+_DEFAULT_CHAINS = {".pdf": "pypdfium2,pdfplumber", ".docx": "python-docx", ".pptx": "python-pptx"}
+
+def backend_chain(ext: str) -> List[str]:
+    raw = os.getenv(f"EXTRACT_BACKENDS_{ext.lstrip('.').upper()}") or _DEFAULT_CHAINS[ext]
+    names = [n.strip() for n in raw.split(",") if n.strip()]
+    unknown = [n for n in names if n not in BACKENDS[ext]]
+    if unknown:
+        raise ValueError(f"Unknown {ext} extraction backend(s): {', '.join(unknown)}")
+    return names
+
+def join_parts(parts: List[str]) -> str:
+    return "\n".join(parts).strip()
+
+def extract_file(path: str, ext: str, backend: Optional[str] = None) -> str:
+    """Synchronous, single-process extraction of one file on disk."""
+    for name in ([backend] if backend else backend_chain(ext)):
+        try:
+            text = join_parts(BACKENDS[ext][name](path))
+        except Exception as e:
+            print(f"{name} could not read {path}:", e)
+            continue
+        if text:
+            return text
+    return ""
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0  # not Linux: memory ceiling is not enforced
+
+def _in_worker(fn, *args):
+    """Worker entry point: run fn, free parser garbage, report resident memory."""
+    result = fn(*args)
+    gc.collect()
+    return result, _rss_bytes()
+
+async def _submit(fn, *args):
+    loop = asyncio.get_running_loop()
+    result, rss = await loop.run_in_executor(get_pool(), _in_worker, fn, *args)
+    if EXTRACT_WORKER_MAX_RSS_MB and rss > EXTRACT_WORKER_MAX_RSS_MB * 1024 * 1024:
+        _recycle_pool()
+    return result
+
+async def _extract_paged(reader: Callable[..., List[str]], path: str, n_pages: int) -> List[str]:
+    if n_pages <= PDF_PAGES_PER_TASK:
+        return await _submit(reader, path, 0, n_pages)
+    ranges = [(s, min(s + PDF_PAGES_PER_TASK, n_pages)) for s in range(0, n_pages, PDF_PAGES_PER_TASK)]
+    chunks = await asyncio.gather(*(_submit(reader, path, a, b) for a, b in ranges))
+    return [part for chunk in chunks for part in chunk]
+
+async def extract_path(path: str, ext: str, chain: Optional[List[str]] = None) -> List[str]:
+    """Run the backend chain for `ext` on a file; parts (pages/paragraphs/slides) of the first non-empty result."""
+    n_pages: Optional[int] = None
+    for name in (chain or backend_chain(ext)):
+        reader = BACKENDS[ext][name]
+        try:
+            if ext in _PAGED_EXTS:
+                if n_pages is None:
+                    n_pages = await _submit(_pdf_page_count, path, name)
+                parts = await _extract_paged(reader, path, n_pages)
+            else:
+                parts = await _submit(reader, path)
+        except BrokenProcessPool:
+            # the parser crashed its worker: fresh workers for the next backend
+            print(f"{name} crashed an extraction worker on {path}")
+            _recycle_pool()
+            continue
+        except Exception as e:
+            print(f"{name} could not read {path}:", e)
+            continue
+        if join_parts(parts):
+            return parts
+    return []
+
+
+# --- Upload handling ---
+async def extract_upload(upload: SpooledUpload) -> List[str]:
+    """Parts of one spooled upload ([] if nothing readable), served from the extraction cache when possible."""
+    chain = backend_chain(upload.ext)
+    key = extract_cache.cache_key(upload.sha256, ",".join(chain))
+    cached = await run_in_threadpool(extract_cache.get, key)
+    if cached is not None:
+        return json.loads(cached)
+    parts = await extract_path(upload.path, upload.ext, chain)
+    if parts:
+        await run_in_threadpool(extract_cache.put, key, json.dumps(parts, ensure_ascii=False))
+    return parts
+
+async def _extract_required(upload: SpooledUpload) -> List[str]:
+    parts = await extract_upload(upload)
+    if not parts:
+        raise HTTPException(status_code=400, detail=f"No readable text found in {upload.filename}. If it is a scanned PDF, add OCR.")
+    return parts
+
+async def extract_uploads(uploads: List[SpooledUpload]) -> List[ExtractedFile]:
+    """Extract every upload concurrently; results come back in upload order."""
+    results = await asyncio.gather(*(_extract_required(up) for up in uploads))
+    return [
+        ExtractedFile(pathlib.Path(up.filename).stem, UNIT_TYPES[up.ext], parts)
+        for up, parts in zip(uploads, results)
+    ]
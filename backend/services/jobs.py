@@ -0,0 +1,316 @@
+# backend/services/jobs.py
+"""
+Background job queue for slow LLM generations (summary, flashcards, quiz).
+
+Jobs are rows in the jobs table, so their state survives restarts. Each app
+process runs JOB_WORKERS asyncio workers; async handlers run on the event
+loop and sync handlers in the threadpool, so at most JOB_WORKERS generations
+per process are in flight and no request thread waits on a model call.
+
+    register("quiz", handler)            # handler(params) -> response dict
+    await run_job("quiz", course_id, params, background)
+
+run_job() answers right away with the job id when background=True;
+otherwise it awaits the job (without holding a thread) and returns the
+handler's response, so existing clients keep working. A worker claims a job
+with a conditional UPDATE, so a job queued by several processes runs once.
+
+Single-flight: run_job() stores dedupe_key = sha256(kind, params), and a
+partial unique index allows one queued/running job per key. A request that
+loses the insert joins the active job instead (same job id, same result),
+whichever uvicorn worker runs it. Quizzes opt out (dedupe=False): each one
+records a single attempt's answers and score, so callers must not share it.
+Jobs left 'running' for longer than JOB_STALE_SECONDS (a crashed process)
+are queued again: on startup and every JOB_RECOVER_SECONDS after, and right
+away when a request would otherwise join such a job. A request that waits
+for its job gives up after JOB_WAIT_SECONDS with a 504 naming the job id,
+which can still be polled.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models import Job
+
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))
+JOB_RECOVER_SECONDS = int(os.getenv("JOB_RECOVER_SECONDS", "60"))
+# How long a non-background request waits for its job
+JOB_WAIT_SECONDS = int(os.getenv("JOB_WAIT_SECONDS", "300"))
+
+_SESSION_FACTORY: Optional[Callable[[], Session]] = None
+def set_session_factory_for_jobs(factory: Callable[[], Session]) -> None:
+    global _SESSION_FACTORY
+    _SESSION_FACTORY = factory
+
+_HANDLERS: Dict[str, Callable[[dict], Any]] = {}
+_QUEUE: Optional[asyncio.Queue] = None
+_WORKERS: List[asyncio.Task] = []
+_WAITERS: Dict[str, asyncio.Future] = {}
+_RUNNING: Set[str] = set()
+_LOCAL: Set[str] = set()  # queued or running in this process
+
+
+def register(kind: str, handler: Callable[[dict], Any]) -> None:
+    """handler(params) returns the endpoint's response dict; it may be sync or async."""
+    _HANDLERS[kind] = handler
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _stale_cutoff() -> datetime:
+    return _now() - timedelta(seconds=JOB_STALE_SECONDS)
+
+def _fail_result(msg: str) -> dict:
+    return {"status": "FAIL", "statusCode": 200, "message": msg, "data": ""}
+
+def job_accepted(job_id: str) -> dict:
+    return {
+        "status": "SUCCESS", "statusCode": 200,
+        "message": f"Job {job_id} queued. Poll GET /jobs/{job_id} for the result.",
+        "data": json.dumps({"job_id": job_id, "status": "queued"}),
+    }
+
+
+def dedupe_key(kind: str, params: dict) -> str:
+    return hashlib.sha256(json.dumps([kind, params], sort_keys=True).encode()).hexdigest()
+
+
+# --- DB helpers (run in the threadpool) ---
+def _insert(job_id: str, kind: str, course_id: Optional[int], params: dict,
+            dedupe: Optional[str] = None) -> Tuple[str, bool]:
+    """Insert a queued job; with `dedupe`, join the active job for that key instead. Returns (job_id, created)."""
+    for _ in range(3):
+        with _SESSION_FACTORY() as db:
+            try:
+                db.add(Job(job_id=job_id, kind=kind, course_id=course_id, params_json=json.dumps(params),
+                           dedupe_key=dedupe, status="queued"))
+                db.commit()
+                return job_id, True
+            except IntegrityError:
+                db.rollback()
+            active = db.execute(
+                select(Job.job_id).where(Job.dedupe_key == dedupe, Job.status.in_(("queued", "running")))
+            ).scalar_one_or_none()
+            if active is not None:
+                # its process died mid-run: take it over instead of waiting on it
+                return active, active not in _RUNNING and _reclaim(db, active)
+        # the active job finished in between; try again
+    raise RuntimeError(f"Could not enqueue {kind} job")
+
+def _reclaim(db: Session, job_id: str) -> bool:
+    """Queue a job again if it has been 'running' past the stale cutoff; True if it was."""
+    reclaimed = db.execute(
+        update(Job)
+        .where(Job.job_id == job_id, Job.status == "running", Job.started_at < _stale_cutoff())
+        .values(status="queued")
+    ).rowcount
+    db.commit()
+    return bool(reclaimed)
+
+def _reclaim_stale(job_id: str) -> bool:
+    with _SESSION_FACTORY() as db:
+        return _reclaim(db, job_id)
+
+def _claim(job_id: str) -> Optional[Tuple[str, dict]]:
+    with _SESSION_FACTORY() as db:
+        claimed = db.execute(
+            update(Job)
+            .where(Job.job_id == job_id, Job.status == "queued")
+            .values(status="running", started_at=_now(), attempts=Job.attempts + 1)
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return None
+        row = db.execute(select(Job.kind, Job.params_json).where(Job.job_id == job_id)).one()
+    return row[0], json.loads(row[1])
+
+def _finish(job_id: str, status: str, result: dict, error: Optional[str]) -> None:
+    with _SESSION_FACTORY() as db:
+        db.execute(
+            update(Job).where(Job.job_id == job_id)
+            .values(status=status, result_json=json.dumps(result), error=error, finished_at=_now())
+        )
+        db.commit()
+
+def _requeue(job_ids: List[str]) -> None:
+    if not job_ids:
+        return
+    with _SESSION_FACTORY() as db:
+        db.execute(update(Job).where(Job.job_id.in_(job_ids), Job.status == "running").values(status="queued"))
+        db.commit()
+
+def _recover(running_here: List[str]) -> List[str]:
+    """Queue stale 'running' jobs (not the ones this process runs) again; ids of all queued jobs."""
+    with _SESSION_FACTORY() as db:
+        db.execute(
+            update(Job)
+            .where(Job.status == "running", Job.started_at < _stale_cutoff(), Job.job_id.not_in(running_here))
+            .values(status="queued")
+        )
+        db.commit()
+        return list(db.execute(select(Job.job_id).where(Job.status == "queued").order_by(Job.created_at)).scalars())
+
+def get_job(job_id: str) -> Optional[dict]:
+    with _SESSION_FACTORY() as db:
+        job = db.get(Job, job_id)
+        if job is None:
+            return None
+        return {
+            "job_id": job.job_id,
+            "kind": job.kind,
+            "course_id": job.course_id,
+            "status": job.status,
+            "error": job.error,
+            "attempts": job.attempts,
+            "result": json.loads(job.result_json) if job.result_json else None,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        }
+
+
+# --- workers ---
+async def _run(job_id: str) -> None:
+    claimed = await run_in_threadpool(_claim, job_id)
+    if claimed is None:
+        # already taken by another process (startup recovery); follow it through the table
+        _LOCAL.discard(job_id)
+        if job_id in _WAITERS:
+            asyncio.create_task(_follow(job_id))
+        return
+    kind, params = claimed
+    _RUNNING.add(job_id)
+    try:
+        handler = _HANDLERS.get(kind)
+        if handler is None:
+            result = _fail_result(f"Unknown job kind '{kind}'")
+        elif asyncio.iscoroutinefunction(handler):
+            result = await handler(params)
+        else:
+            result = await run_in_threadpool(handler, params)
+    except Exception as e:
+        print(f"Job {job_id} ({kind}) failed:", e)
+        result = _fail_result(f"Job failed: {type(e).__name__}")
+    _RUNNING.discard(job_id)
+
+    ok = result.get("status") == "SUCCESS"
+    await run_in_threadpool(_finish, job_id, "succeeded" if ok else "failed", result,
+                            None if ok else result.get("message"))
+    _LOCAL.discard(job_id)
+    waiter = _WAITERS.pop(job_id, None)
+    if waiter is not None and not waiter.done():
+        waiter.set_result(result)
+
+async def _follow(job_id: str) -> None:
+    while True:
+        await asyncio.sleep(1.0)
+        if job_id in _LOCAL:
+            return  # taken over by this process; _run resolves the waiter
+        job = await run_in_threadpool(get_job, job_id)
+        if job is None or job["status"] in ("succeeded", "failed"):
+            break
+        if job["status"] == "running" and await run_in_threadpool(_reclaim_stale, job_id):
+            # the process running it died: run it here
+            _LOCAL.add(job_id)
+            _QUEUE.put_nowait(job_id)
+            return
+    waiter = _WAITERS.pop(job_id, None)
+    if waiter is not None and not waiter.done():
+        waiter.set_result((job or {}).get("result") or _fail_result(f"Job {job_id} vanished"))
+
+async def _worker() -> None:
+    while True:
+        job_id = await _QUEUE.get()
+        try:
+            await _run(job_id)
+        except Exception as e:  # DB trouble: the job stays queued/running and is recovered later
+            print(f"Job worker error on {job_id}:", e)
+            _LOCAL.discard(job_id)
+            waiter = _WAITERS.pop(job_id, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(_fail_result(f"Job failed: {type(e).__name__}"))
+        finally:
+            _QUEUE.task_done()
+
+async def _recover_queued() -> None:
+    for job_id in await run_in_threadpool(_recover, list(_RUNNING)):
+        if job_id not in _LOCAL:
+            _LOCAL.add(job_id)
+            _QUEUE.put_nowait(job_id)
+
+async def _recovery_loop() -> None:
+    while True:
+        await asyncio.sleep(JOB_RECOVER_SECONDS)
+        try:
+            await _recover_queued()
+        except Exception as e:
+            print("Job recovery failed:", e)
+
+async def start() -> None:
+    global _QUEUE
+    _QUEUE = asyncio.Queue()
+    _WORKERS[:] = [asyncio.create_task(_worker()) for _ in range(JOB_WORKERS)]
+    await _recover_queued()
+    _WORKERS.append(asyncio.create_task(_recovery_loop()))
+
+async def stop() -> None:
+    for t in _WORKERS:
+        t.cancel()
+    await asyncio.gather(*_WORKERS, return_exceptions=True)
+    _WORKERS.clear()
+    # interrupted jobs run again on the next start
+    await run_in_threadpool(_requeue, list(_RUNNING))
+    _RUNNING.clear()
+    _LOCAL.clear()
+
+
+def _waiter(job_id: str) -> asyncio.Future:
+    waiter = _WAITERS.get(job_id)
+    if waiter is None:
+        waiter = _WAITERS[job_id] = asyncio.get_running_loop().create_future()
+        if job_id not in _LOCAL:
+            asyncio.create_task(_follow(job_id))  # run by another process
+    return waiter
+
+async def enqueue(kind: str, course_id: Optional[int], params: dict, wait: bool = False,
+                  dedupe: bool = False) -> str:
+    """Queue a job (or, with dedupe, join an identical active one) and return its id."""
+    job_id, created = await run_in_threadpool(
+        _insert, uuid.uuid4().hex, kind, course_id, params, dedupe_key(kind, params) if dedupe else None
+    )
+    if created:
+        _LOCAL.add(job_id)
+    if wait:
+        _waiter(job_id)
+    if created:
+        _QUEUE.put_nowait(job_id)
+    return job_id
+
+async def run_job(kind: str, course_id: Optional[int], params: dict, background: bool,
+                  dedupe: bool = True) -> dict:
+    """dedupe=False for jobs whose result is per caller (a quiz holds one student's answers)."""
+    job_id = await enqueue(kind, course_id, params, wait=not background, dedupe=dedupe)
+    if background:
+        return job_accepted(job_id)
+    try:
+        # shield: a client that disconnects or times out does not cancel the job (or other waiters)
+        return await asyncio.wait_for(asyncio.shield(_WAITERS[job_id]), JOB_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Job {job_id} is still running after {JOB_WAIT_SECONDS}s. Poll GET /jobs/{job_id} for the result.",
+        )
@@ -0,0 +1,177 @@
+# backend/services/llm_cache.py
+"""
+Shared cache of LLM responses (OpenAI and Gemini).
+
+Key = sha256(provider, model, prompt, params), so an identical summary,
+flashcard, chat or translate request is answered without a paid model call.
+Quizzes are not cached: each one is a new attempt and must get new questions.
+Two tiers:
+  - an in-process LRU of LLM_CACHE_MEMORY_ENTRIES responses;
+  - the llm_cache table, shared by all workers, where rows expire after
+    LLM_CACHE_TTL_HOURS and the oldest rows go once there are more than
+    LLM_CACHE_MAX_ROWS.
+Callers pass refresh=True to skip the lookup (forced regeneration); the fresh
+response replaces the cached one. Cache failures never fail the model call.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models import LLMCacheEntry
+
+load_dotenv()
+
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168"))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "20000"))
+# Table eviction runs once every this many stores
+_EVICT_EVERY = 100
+
+_SESSION_FACTORY: Optional[Callable[[], Session]] = None
+def set_session_factory_for_llm_cache(factory: Callable[[], Session]) -> None:
+    global _SESSION_FACTORY
+    _SESSION_FACTORY = factory
+
+_LOCK = threading.Lock()
+_MEMORY: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key -> (expires at, response)
+_STATS = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "bypassed": 0, "evictions": 0}
+
+
+def cache_key(provider: str, model: str, prompt: Any, params: Optional[dict] = None) -> str:
+    raw = json.dumps([provider, model, prompt, params or {}], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _count(name: str, n: int = 1) -> None:
+    with _LOCK:
+        _STATS[name] += n
+
+def _remember(key: str, value: str, expires: float) -> None:
+    with _LOCK:
+        _MEMORY[key] = (expires, value)
+        _MEMORY.move_to_end(key)
+        while len(_MEMORY) > LLM_CACHE_MEMORY_ENTRIES:
+            _MEMORY.popitem(last=False)
+
+def get(key: str) -> Optional[str]:
+    now = time.time()
+    with _LOCK:
+        hit = _MEMORY.get(key)
+        if hit is not None:
+            if hit[0] > now:
+                _MEMORY.move_to_end(key)
+                _STATS["memory_hits"] += 1
+                return hit[1]
+            del _MEMORY[key]
+
+    row = None
+    if _SESSION_FACTORY is not None:
+        try:
+            with _SESSION_FACTORY() as db:
+                row = db.execute(
+                    select(LLMCacheEntry.response_text, LLMCacheEntry.expires_at)
+                    .where(LLMCacheEntry.cache_key == key, LLMCacheEntry.expires_at > datetime.now(timezone.utc))
+                ).one_or_none()
+        except SQLAlchemyError as e:
+            print("LLM cache read error:", e)
+    if row is None:
+        _count("misses")
+        return None
+    _count("db_hits")
+    _remember(key, row[0], row[1].timestamp())
+    return row[0]
+
+def put(key: str, provider: str, model: str, value: str) -> None:
+    expires = datetime.now(timezone.utc) + timedelta(hours=LLM_CACHE_TTL_HOURS)
+    _remember(key, value, expires.timestamp())
+    with _LOCK:
+        _STATS["stores"] += 1
+        evict = _STATS["stores"] % _EVICT_EVERY == 0
+    if _SESSION_FACTORY is None:
+        return
+    try:
+        with _SESSION_FACTORY() as db:
+            stmt = pg_insert(LLMCacheEntry).values(
+                cache_key=key, provider=provider, model=model, response_text=value, expires_at=expires
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[LLMCacheEntry.cache_key],
+                set_={"response_text": stmt.excluded.response_text, "expires_at": stmt.excluded.expires_at,
+                      "created_at": func.now()},
+            ))
+            db.commit()
+            if evict:
+                _evict(db)
+    except SQLAlchemyError as e:
+        print("LLM cache write error:", e)
+
+def _evict(db: Session) -> None:
+    removed = db.execute(
+        delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= datetime.now(timezone.utc))
+    ).rowcount or 0
+    total = db.execute(select(func.count()).select_from(LLMCacheEntry)).scalar_one()
+    if total > LLM_CACHE_MAX_ROWS:
+        oldest = (
+            select(LLMCacheEntry.cache_key)
+            .order_by(LLMCacheEntry.created_at.asc())
+            .limit(total - LLM_CACHE_MAX_ROWS)
+            .scalar_subquery()
+        )
+        removed += db.execute(delete(LLMCacheEntry).where(LLMCacheEntry.cache_key.in_(oldest))).rowcount or 0
+    db.commit()
+    _count("evictions", removed)
+
+
+def cached_call(provider: str, model: str, prompt: Any, params: Optional[dict], call: Callable[[], str],
+                refresh: bool = False, accept: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Return the cached response for (provider, model, prompt, params), or run
+    call() and cache its result. Results rejected by accept() are not stored.
+    """
+    key = cache_key(provider, model, prompt, params)
+    if refresh:
+        _count("bypassed")
+    else:
+        hit = get(key)
+        if hit is not None:
+            return hit
+    out = call()
+    if out and (accept is None or accept(out)):
+        put(key, provider, model, out)
+    return out
+
+async def acached_call(provider: str, model: str, prompt: Any, params: Optional[dict],
+                       call: Callable[[], Awaitable[str]], refresh: bool = False,
+                       accept: Optional[Callable[[str], bool]] = None) -> str:
+    """cached_call() for async model calls; the DB tier runs in the threadpool."""
+    key = cache_key(provider, model, prompt, params)
+    if refresh:
+        _count("bypassed")
+    else:
+        hit = await run_in_threadpool(get, key)
+        if hit is not None:
+            return hit
+    out = await call()
+    if out and (accept is None or accept(out)):
+        await run_in_threadpool(put, key, provider, model, out)
+    return out
+
+def stats() -> dict:
+    with _LOCK:
+        out = dict(_STATS)
+        out["memory_entries"] = len(_MEMORY)
+    hits = out["memory_hits"] + out["db_hits"]
+    lookups = hits + out["misses"]
+    out["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+    return out
@@ -0,0 +1,95 @@
+# backend/services/llm_clients.py
+"""
+Process-wide LLM provider clients.
+
+Each client is built once, on first use, and reused by every request, so
+generations share keep-alive connection pools instead of paying client
+construction and a TLS handshake per call:
+  - openai_client():       sync OpenAI, for handlers that run in the threadpool
+  - async_openai_client(): AsyncOpenAI, for async handlers and services
+  - gemini_model(name):    google.generativeai model (its *_async methods are async)
+Pool size and timeouts come from LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE,
+LLM_TIMEOUT_SECONDS and LLM_CONNECT_TIMEOUT_SECONDS. close_clients() is
+called from the app lifespan on shutdown.
+"""
+import os
+import threading
+from typing import Dict, Optional
+
+import google.generativeai as genai
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI, Timeout
+
+load_dotenv()
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+
+_LOCK = threading.Lock()
+_openai: Optional[OpenAI] = None
+_async_openai: Optional[AsyncOpenAI] = None
+_gemini_models: Dict[str, genai.GenerativeModel] = {}
+_gemini_configured = False
+
+
+def _openai_key() -> str:
+    key = os.getenv("OPENAI_API_KEY", "").strip()
+    if not key:
+        raise RuntimeError("Missing OPENAI_API_KEY")
+    return key
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE)
+
+def _timeout() -> Timeout:
+    return Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+
+def openai_client() -> OpenAI:
+    global _openai
+    if _openai is None:
+        with _LOCK:
+            if _openai is None:
+                _openai = OpenAI(
+                    api_key=_openai_key(),
+                    timeout=_timeout(),
+                    http_client=DefaultHttpxClient(limits=_limits()),
+                )
+    return _openai
+
+def async_openai_client() -> AsyncOpenAI:
+    global _async_openai
+    if _async_openai is None:
+        with _LOCK:
+            if _async_openai is None:
+                _async_openai = AsyncOpenAI(
+                    api_key=_openai_key(),
+                    timeout=_timeout(),
+                    http_client=DefaultAsyncHttpxClient(limits=_limits()),
+                )
+    return _async_openai
+
+def gemini_model(name: str) -> genai.GenerativeModel:
+    global _gemini_configured
+    model = _gemini_models.get(name)
+    if model is None:
+        with _LOCK:
+            if not _gemini_configured:
+                genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+                _gemini_configured = True
+            model = _gemini_models.setdefault(name, genai.GenerativeModel(name))
+    return model
+
+
+async def close_clients() -> None:
+    global _openai, _async_openai
+    with _LOCK:
+        sync_client, async_client = _openai, _async_openai
+        _openai = _async_openai = None
+        _gemini_models.clear()
+    if sync_client is not None:
+        sync_client.close()
+    if async_client is not None:
+        await async_client.close()
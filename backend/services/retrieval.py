@@ -0,0 +1,130 @@
+# backend/services/retrieval.py
+"""
+BM25 lexical retrieval over a list of text chunks.
+
+Pure index code (no DB): `BM25Index.build(texts)` makes postings once, `scores()`
+evaluates a query for every chunk at once with numpy, and `select_chunks()`
+picks chunk indices that fit a token budget. Course indexes are persisted by
+services/course_chunks.py.
+"""
+import json
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be been but by can do for from has have how if in into is it its not no of on or "
+    "so such than that the their then there these they this to was we were what when where which who will "
+    "with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, doc_lens: Sequence[int], token_counts: Sequence[int],
+                 postings: Dict[str, Tuple[Sequence[int], Sequence[int]]]) -> None:
+        self.doc_lens = np.asarray(doc_lens, dtype=np.float32)
+        self.token_counts = list(token_counts)  # prompt-token size of each chunk
+        self.n_docs = len(doc_lens)
+        self.avg_len = float(self.doc_lens.mean()) if self.n_docs else 0.0
+        self._raw = postings
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def build(cls, texts: Sequence[str], token_counts: Sequence[int]) -> "BM25Index":
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        doc_lens = []
+        for i, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                ids, tfs = postings.setdefault(term, ([], []))
+                ids.append(i)
+                tfs.append(tf)
+        return cls(doc_lens, token_counts, postings)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "doc_lens": self.doc_lens.astype(int).tolist(),
+            "token_counts": self.token_counts,
+            "postings": {t: [list(ids), list(tfs)] for t, (ids, tfs) in self._raw.items()},
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "BM25Index":
+        data = json.loads(raw)
+        return cls(data["doc_lens"], data["token_counts"], {t: (p[0], p[1]) for t, p in data["postings"].items()})
+
+    def _term(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrs = self._postings.get(term)
+        if arrs is None:
+            ids, tfs = self._raw.get(term, ((), ()))
+            arrs = (np.asarray(ids, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+            self._postings[term] = arrs
+        return arrs
+
+    def _idf(self, df: int) -> float:
+        return math.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for `query` (zeros when nothing matches)."""
+        out = np.zeros(self.n_docs, dtype=np.float32)
+        if not self.n_docs:
+            return out
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_lens / (self.avg_len or 1.0))
+        for term, qtf in Counter(tokenize(query)).items():
+            ids, tfs = self._term(term)
+            if not len(ids):
+                continue
+            out[ids] += qtf * self._idf(len(ids)) * tfs * (BM25_K1 + 1.0) / (tfs + norm[ids])
+        return out
+
+    def salient_terms(self, n: int = 20) -> List[str]:
+        """Terms that characterise the whole corpus (total tf x idf); a query for 'cover everything' tasks."""
+        ranked = sorted(
+            self._raw.items(),
+            key=lambda kv: sum(kv[1][1]) * self._idf(len(kv[1][0])) if len(kv[1][0]) < self.n_docs else 0.0,
+            reverse=True,
+        )
+        return [t for t, _ in ranked[:n]]
+
+
+def select_chunks(index: BM25Index, query: str, token_budget: int, spread: bool = False) -> List[int]:
+    """
+    Chunk indices (in reading order) that fit in token_budget, best BM25 first.
+    spread=True first takes the best chunk of each equal-sized region of the
+    document, so the selection covers the whole course rather than one hot spot.
+    """
+    n = index.n_docs
+    if sum(index.token_counts) <= token_budget:
+        return list(range(n))
+    scores = index.scores(query)
+    by_score = [int(i) for i in np.argsort(-scores, kind="stable")]
+
+    order: List[int] = []
+    if spread:
+        avg_tokens = max(1, sum(index.token_counts) // max(n, 1))
+        regions = max(1, min(n, token_budget // avg_tokens))
+        bounds = np.linspace(0, n, regions + 1).astype(int)
+        best = [int(lo + np.argmax(scores[lo:hi])) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+        order = sorted(best, key=lambda i: -scores[i])
+    seen = set(order)
+    order += [i for i in by_score if i not in seen]
+
+    chosen: List[int] = []
+    used = 0
+    for i in order:
+        if used + index.token_counts[i] <= token_budget:
+            chosen.append(i)
+            used += index.token_counts[i]
+    return sorted(chosen)
@@ -0,0 +1,192 @@
+# backend/services/speech.py
+"""
+Text-to-speech with ElevenLabs for texts of any length.
+
+synthesize() splits the text on sentence boundaries into segments of at most
+TTS_SEGMENT_CHARS (the first one at most TTS_FIRST_SEGMENT_CHARS, so the first
+audio arrives as fast as for a short request) and synthesizes them in a
+look-ahead pipeline: while segment N is streamed to the client, segments
+N+1..N+TTS_LOOKAHEAD are already being generated in the thread pool. The
+segments' audio is concatenated into one continuous stream; previous_text/
+next_text give ElevenLabs the neighbouring sentences so prosody carries across
+segment joins.
+
+Only formats whose streams concatenate cleanly are split (mp3 frames, raw
+pcm/ulaw samples). wav and opus carry a container header per response, so
+their texts are synthesized in one request and may be at most
+TTS_SEGMENT_CHARS long.
+
+The pool (TTS_WORKERS threads) is shared by all requests and background jobs,
+so it also caps concurrent calls to ElevenLabs per process.
+"""
+import os
+import queue
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+from dotenv import load_dotenv
+from elevenlabs import ElevenLabs
+
+load_dotenv()
+
+DEFAULT_VOICE_ID = "TZXnHeB62zELHhRDHuu1"
+DEFAULT_MODEL_ID = "eleven_multilingual_v2"
+DEFAULT_OUTPUT_FORMAT = "mp3_44100_128"
+
+TTS_SEGMENT_CHARS = int(os.getenv("TTS_SEGMENT_CHARS", "1500"))
+TTS_FIRST_SEGMENT_CHARS = int(os.getenv("TTS_FIRST_SEGMENT_CHARS", "300"))
+TTS_LOOKAHEAD = int(os.getenv("TTS_LOOKAHEAD", "2"))
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "8"))
+# Upper bound on one request's text (about an hour of speech)
+TTS_MAX_CHARS = int(os.getenv("TTS_MAX_CHARS", "60000"))
+# Neighbouring text sent as previous_text / next_text
+_CONTEXT_CHARS = 300
+
+ELEVEN_KEY = os.getenv("ELEVENLABS_API_KEY")
+if not ELEVEN_KEY:
+    print("⚠️ ELEVENLABS_API_KEY is not set in .env")
+
+# output_format prefixes whose segment audio can simply be appended
+_CONCATENABLE = ("mp3_", "pcm_", "ulaw_")
+_SENTENCE_END = re.compile(r"(?<=[.!?;:。！？])\s+|\n+")
+_DONE = object()
+_LOCK = threading.Lock()
+_client: Optional[ElevenLabs] = None
+_POOL: Optional[ThreadPoolExecutor] = None
+
+
+def eleven_client() -> ElevenLabs:
+    global _client
+    if _client is None:
+        with _LOCK:
+            if _client is None:
+                _client = ElevenLabs(api_key=ELEVEN_KEY)
+    return _client
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        with _LOCK:
+            if _POOL is None:
+                _POOL = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+    return _POOL
+
+def shutdown_pool() -> None:
+    global _POOL
+    with _LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _hard_split(sentence: str, limit: int) -> List[str]:
+    """Cut an over-long sentence at word boundaries."""
+    parts: List[str] = []
+    while len(sentence) > limit:
+        cut = sentence.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        parts.append(sentence)
+    return parts
+
+def split_segments(text: str) -> List[str]:
+    """Whole sentences packed into segments; the first one is kept short."""
+    segments: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        limit = TTS_FIRST_SEGMENT_CHARS if not segments else TTS_SEGMENT_CHARS
+        if current and len(current) + 1 + len(sentence) > limit:
+            segments.append(current)
+            current = ""
+            limit = TTS_SEGMENT_CHARS
+        if len(sentence) > limit:
+            # only the opening piece is kept short; the rest is cut at the normal size
+            first, *rest = _hard_split(sentence, limit)
+            if rest and limit < TTS_SEGMENT_CHARS:
+                rest = _hard_split(" ".join(rest), TTS_SEGMENT_CHARS)
+            *full, sentence = [first, *rest]
+            segments.extend(full)
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        segments.append(current)
+    return segments
+
+
+def max_chars(output_format: str) -> int:
+    """Longest text synthesize() accepts for output_format."""
+    return TTS_MAX_CHARS if output_format.startswith(_CONCATENABLE) else TTS_SEGMENT_CHARS
+
+
+def _produce(out: "queue.Queue", stop: threading.Event, segments: List[str], i: int,
+             voice_id: str, model_id: str, output_format: str) -> None:
+    if stop.is_set():
+        return
+    try:
+        audio = eleven_client().text_to_speech.convert(
+            text=segments[i],
+            voice_id=voice_id,
+            model_id=model_id,
+            output_format=output_format,
+            previous_text=segments[i - 1][-_CONTEXT_CHARS:] if i > 0 else None,
+            next_text=segments[i + 1][:_CONTEXT_CHARS] if i + 1 < len(segments) else None,
+        )
+        for chunk in audio:
+            if stop.is_set():
+                return
+            if chunk:
+                out.put(chunk)
+        out.put(_DONE)
+    except Exception as e:
+        out.put(e)
+
+def synthesize(text: str, voice_id: str = DEFAULT_VOICE_ID, model_id: str = DEFAULT_MODEL_ID,
+               output_format: str = DEFAULT_OUTPUT_FORMAT) -> Iterator[bytes]:
+    """
+    Audio for the whole text, as one stream of chunks; segments are generated TTS_LOOKAHEAD ahead.
+    Raises ValueError when the text is longer than max_chars(output_format).
+    """
+    if len(text) > max_chars(output_format):
+        raise ValueError(f"Text is longer than {max_chars(output_format)} characters "
+                         f"for output format {output_format}.")
+    if output_format.startswith(_CONCATENABLE):
+        segments = split_segments(text)
+    else:
+        segments = [text.strip()]
+    return _pipeline(segments, voice_id, model_id, output_format)
+
+def _pipeline(segments: List[str], voice_id: str, model_id: str, output_format: str) -> Iterator[bytes]:
+    stop = threading.Event()
+    started: deque = deque()
+    next_segment = 0
+
+    def start_next() -> None:
+        nonlocal next_segment
+        q: queue.Queue = queue.Queue()
+        _pool().submit(_produce, q, stop, segments, next_segment, voice_id, model_id, output_format)
+        started.append(q)
+        next_segment += 1
+
+    try:
+        while started or next_segment < len(segments):
+            while next_segment < len(segments) and len(started) <= TTS_LOOKAHEAD:
+                start_next()
+            q = started.popleft()
+            while True:
+                item = q.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+    finally:
+        # client went away or a segment failed: abandon the look-ahead work
+        stop.set()
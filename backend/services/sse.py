@@ -0,0 +1,10 @@
+# backend/services/sse.py
+"""Server-Sent Events framing shared by the streaming endpoints."""
+import json
+
+# no-transform/no buffering so proxies (nginx) pass each event through as it is written
+SSE_HEADERS = {"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
@@ -0,0 +1,196 @@
+# backend/services/summarizer.py
+"""
+Map-reduce course summarization.
+
+map:    the course's chunks are grouped into ~SUMMARY_MAP_TOKENS pieces and each
+        piece is summarized concurrently (at most SUMMARY_MAX_INFLIGHT calls).
+reduce: partial summaries are regrouped and summarized again, stage by stage,
+        until they fit one prompt; the last call writes the short/medium/long
+        summary the student asked for.
+
+Partials do not depend on the requested length, so they are stored in
+summary_partials keyed by a hash of their input; regenerating another length
+only pays for the final call. The final call itself goes through the shared
+LLM response cache (services/llm_cache.py). refresh=True recomputes every
+stage (and overwrites the stored partials), so regenerating also replaces a
+bad partial.
+
+stream_summary() is the streaming form of the final call: it yields text
+deltas as the model produces them and caches the full text at the end.
+"""
+import asyncio
+import hashlib
+import os
+from typing import AsyncIterator, Callable, Dict, List
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models import CourseChunk, SummaryPartial
+from services.course_chunks import approx_tokens, ensure_chunks
+from services import llm_cache
+from services.llm_cache import acached_call
+from services.llm_clients import async_openai_client
+
+load_dotenv()
+
+SUMMARY_MODEL = "gpt-4o-mini"
+# Input size of one map/reduce call (approx. tokens)
+SUMMARY_MAP_TOKENS = int(os.getenv("SUMMARY_MAP_TOKENS", "3000"))
+# Output cap of one partial summary
+SUMMARY_PARTIAL_TOKENS = int(os.getenv("SUMMARY_PARTIAL_TOKENS", "400"))
+# Concurrent LLM calls per summary
+SUMMARY_MAX_INFLIGHT = int(os.getenv("SUMMARY_MAX_INFLIGHT", "4"))
+
+# Part of every partial's cache key; bump when the partial prompt changes
+_PARTIAL_PROMPT_VERSION = "1"
+_PARTIAL_PROMPT = (
+    "You are condensing one part of a longer course for a later overall summary. "
+    "Keep every key concept, definition, formula and example in this part. "
+    "Use short bullet points. Do not add an introduction or conclusion.\n\n"
+)
+
+def final_prompt(summary_length: str, material: str) -> str:
+    system_prompt = (
+        f"You are a helpful teaching assistant. Summarize the following course material in {summary_length} form. "
+        "Explain concepts in very simple, clear language that any student can understand. "
+        "Avoid jargon. Use bullet points and short sentences."
+    )
+    return f"{system_prompt}\n\nSummarize this course content:\n\n{material}"
+
+async def _complete(prompt: str, max_output_tokens: int) -> str:
+    resp = await async_openai_client().responses.create(
+        model=SUMMARY_MODEL,
+        input=prompt,
+        max_output_tokens=max_output_tokens,
+    )
+    return getattr(resp, "output_text", None) or str(resp)
+
+
+def _group(texts: List[str], budget: int) -> List[str]:
+    """Concatenate consecutive texts into groups of at most ~budget tokens (at least two per group when reducing)."""
+    groups: List[List[str]] = []
+    used = 0
+    for t in texts:
+        size = approx_tokens(t)
+        if groups and (used + size <= budget or (len(groups[-1]) < 2 and len(texts) > 1)):
+            groups[-1].append(t)
+            used += size
+        else:
+            groups.append([t])
+            used = size
+    return ["\n\n".join(g) for g in groups]
+
+def _partial_key(text: str) -> str:
+    return hashlib.sha256(f"{_PARTIAL_PROMPT_VERSION}:{SUMMARY_MODEL}:{text}".encode()).hexdigest()
+
+
+def _load_chunks(session_factory: Callable[[], Session], course_id: int) -> List[str]:
+    stmt = select(CourseChunk.content).where(CourseChunk.course_id == course_id).order_by(CourseChunk.chunk_index)
+    with session_factory() as db:
+        rows = db.execute(stmt).scalars().all()
+        if not rows:
+            ensure_chunks(db, course_id)
+            rows = db.execute(stmt).scalars().all()
+    return list(rows)
+
+def _load_partials(session_factory: Callable[[], Session], course_id: int, level: int, keys: List[str]) -> Dict[str, str]:
+    with session_factory() as db:
+        rows = db.execute(
+            select(SummaryPartial.input_hash, SummaryPartial.partial_text)
+            .where(SummaryPartial.course_id == course_id, SummaryPartial.level == level,
+                   SummaryPartial.input_hash.in_(keys))
+        ).all()
+    return {k: v for k, v in rows}
+
+def _store_partials(session_factory: Callable[[], Session], course_id: int, level: int, new: Dict[str, str]) -> None:
+    if not new:
+        return
+    with session_factory() as db:
+        stmt = pg_insert(SummaryPartial).values(
+            [{"course_id": course_id, "level": level, "input_hash": k, "partial_text": v} for k, v in new.items()]
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["course_id", "level", "input_hash"],
+            set_={"partial_text": stmt.excluded.partial_text},
+        ))
+        db.commit()
+
+
+async def _summarize_stage(session_factory, course_id: int, level: int, texts: List[str],
+                           sem: asyncio.Semaphore, refresh: bool = False) -> List[str]:
+    keys = [_partial_key(t) for t in texts]
+    cached = {} if refresh else await run_in_threadpool(_load_partials, session_factory, course_id, level, keys)
+
+    async def one(text: str, key: str) -> str:
+        if key in cached:
+            return cached[key]
+        async with sem:
+            return await _complete(_PARTIAL_PROMPT + text, SUMMARY_PARTIAL_TOKENS)
+
+    partials = await asyncio.gather(*(one(t, k) for t, k in zip(texts, keys)))
+    new = {k: p for k, p in zip(keys, partials) if k not in cached}
+    await run_in_threadpool(_store_partials, session_factory, course_id, level, new)
+    return list(partials)
+
+async def build_material(session_factory: Callable[[], Session], course_id: int, refresh: bool = False) -> str:
+    """Run the map/reduce stages; the result fits one final prompt ("" when the course has no content)."""
+    chunks = await run_in_threadpool(_load_chunks, session_factory, course_id)
+    material = "".join(chunks).strip()
+    if not material:
+        return ""
+
+    sem = asyncio.Semaphore(SUMMARY_MAX_INFLIGHT)
+    level = 0
+    while approx_tokens(material) > SUMMARY_MAP_TOKENS and (level == 0 or len(chunks) > 1):
+        texts = _group(chunks, SUMMARY_MAP_TOKENS)
+        chunks = await _summarize_stage(session_factory, course_id, level, texts, sem, refresh)
+        material = "\n\n".join(chunks).strip()
+        level += 1
+    return material
+
+async def summarize_course(session_factory: Callable[[], Session], course_id: int,
+                           summary_length: str, max_output_tokens: int, refresh: bool = False) -> str:
+    """Summary of the whole course; "" when the course has no content."""
+    material = await build_material(session_factory, course_id, refresh)
+    if not material:
+        return ""
+
+    prompt = final_prompt(summary_length, material)
+    return await acached_call(
+        "openai", SUMMARY_MODEL, prompt, {"max_output_tokens": max_output_tokens},
+        lambda: _complete(prompt, max_output_tokens), refresh=refresh,
+    )
+
+async def stream_summary(material: str, summary_length: str, max_output_tokens: int,
+                         refresh: bool = False) -> AsyncIterator[str]:
+    """Final summary call as text deltas; shares its cache entry with summarize_course()."""
+    prompt = final_prompt(summary_length, material)
+    key = llm_cache.cache_key("openai", SUMMARY_MODEL, prompt, {"max_output_tokens": max_output_tokens})
+    if not refresh:
+        hit = await run_in_threadpool(llm_cache.get, key)
+        if hit is not None:
+            yield hit
+            return
+
+    parts: List[str] = []
+    stream = await async_openai_client().responses.create(
+        model=SUMMARY_MODEL,
+        input=prompt,
+        max_output_tokens=max_output_tokens,
+        stream=True,
+    )
+    try:
+        async for event in stream:
+            if event.type == "response.output_text.delta" and event.delta:
+                parts.append(event.delta)
+                yield event.delta
+    finally:
+        # a client that went away stops the generation (and its billing) here
+        await stream.close()
+    text = "".join(parts)
+    if text:
+        await run_in_threadpool(llm_cache.put, key, "openai", SUMMARY_MODEL, text)
@@ -0,0 +1,196 @@
+# backend/services/translation.py
+"""
+Chunked, concurrent translation with a segment-level translation memory.
+
+translate_text() splits the input on paragraph boundaries (and on line
+boundaries inside paragraphs longer than TRANSLATE_SEGMENT_CHARS), keeping the
+whitespace between segments verbatim so line breaks and bullets survive.
+translate_segments() looks every segment up in translation_memory, keyed by
+(sha256 of the segment, target language); only the misses go to Gemini, packed
+into JSON-array batches of up to TRANSLATE_BATCH_CHARS that run concurrently
+(at most TRANSLATE_MAX_INFLIGHT at a time). New translations are written back,
+so repeated boilerplate is translated once, ever.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models import TranslationMemory
+from services.llm_clients import gemini_model
+
+load_dotenv()
+
+TRANSLATE_MODEL = "models/gemini-2.5-flash"
+TRANSLATE_SEGMENT_CHARS = int(os.getenv("TRANSLATE_SEGMENT_CHARS", "1500"))
+TRANSLATE_BATCH_CHARS = int(os.getenv("TRANSLATE_BATCH_CHARS", "4000"))
+TRANSLATE_MAX_INFLIGHT = int(os.getenv("TRANSLATE_MAX_INFLIGHT", "4"))
+
+# Part of every memory key; bump when the prompts change
+_TM_VERSION = "1"
+_PARAGRAPH_SEP = re.compile(r"(\n\s*\n)")
+_LINE_SEP = re.compile(r"(\n)")
+_EDGE_WS = re.compile(r"^(\s*)(.*?)(\s*)$", re.S)
+
+_SESSION_FACTORY: Optional[Callable[[], Session]] = None
+def set_session_factory_for_translation(factory: Callable[[], Session]) -> None:
+    global _SESSION_FACTORY
+    _SESSION_FACTORY = factory
+
+
+def normalize_language(language: str) -> str:
+    return " ".join(language.lower().split())
+
+def _segment_key(segment: str) -> str:
+    return hashlib.sha256(f"{_TM_VERSION}:{TRANSLATE_MODEL}:{segment}".encode("utf-8")).hexdigest()
+
+def split_segments(text: str) -> List[str]:
+    """
+    Cut text into pieces that concatenate back to it exactly. Even indices are
+    translatable segments, odd indices the separators between them (kept as is).
+    """
+    pieces: List[str] = []
+    for i, part in enumerate(_PARAGRAPH_SEP.split(text)):
+        if i % 2:
+            pieces.append(part)
+            continue
+        if len(part) <= TRANSLATE_SEGMENT_CHARS:
+            pieces.append(part)
+            continue
+        # long paragraph: group whole lines into segments of at most ~TRANSLATE_SEGMENT_CHARS
+        lines = _LINE_SEP.split(part)
+        current = lines[0]
+        for j in range(1, len(lines), 2):
+            nxt = lines[j + 1]
+            if len(current) + 1 + len(nxt) > TRANSLATE_SEGMENT_CHARS:
+                pieces.extend([current, "\n"])
+                current = nxt
+            else:
+                current += "\n" + nxt
+        pieces.append(current)
+    return pieces
+
+
+# --- translation memory (run in the threadpool) ---
+def _load_memory(keys: List[str], language: str) -> Dict[str, str]:
+    if not keys or _SESSION_FACTORY is None:
+        return {}
+    with _SESSION_FACTORY() as db:
+        rows = db.execute(
+            select(TranslationMemory.source_hash, TranslationMemory.translated_text)
+            .where(TranslationMemory.target_language == language, TranslationMemory.source_hash.in_(keys))
+        ).all()
+    return {k: v for k, v in rows}
+
+def _store_memory(new: Dict[str, str], language: str) -> None:
+    if not new or _SESSION_FACTORY is None:
+        return
+    with _SESSION_FACTORY() as db:
+        stmt = pg_insert(TranslationMemory).values(
+            [{"source_hash": k, "target_language": language, "translated_text": v} for k, v in new.items()]
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["source_hash", "target_language"],
+            set_={"translated_text": stmt.excluded.translated_text},
+        ))
+        db.commit()
+
+
+# --- model calls ---
+async def _translate_one(segment: str, target_language: str) -> str:
+    prompt = (
+        f"Translate the following text to {target_language}. "
+        "Return ONLY the translation. Preserve line breaks and bulleting.\n\n"
+        f"{segment}"
+    )
+    resp = await gemini_model(TRANSLATE_MODEL).generate_content_async(prompt)
+    return (resp.text or "").strip()
+
+async def _translate_batch(segments: List[str], target_language: str) -> Optional[List[str]]:
+    """Translations in order, or None when the reply does not map one-to-one onto segments."""
+    if len(segments) == 1:
+        return [await _translate_one(segments[0], target_language)]
+    prompt = (
+        f"Translate each string in this JSON array to {target_language}. "
+        "Return ONLY a JSON array of the same length with the translations in the same order. "
+        "Inside each string, preserve line breaks, bullet markers and numbering.\n\n"
+        f"{json.dumps(segments, ensure_ascii=False)}"
+    )
+    resp = await gemini_model(TRANSLATE_MODEL).generate_content_async(
+        prompt, generation_config={"response_mime_type": "application/json"}
+    )
+    try:
+        out = json.loads(resp.text or "")
+        if isinstance(out, list) and len(out) == len(segments) and all(isinstance(t, str) for t in out):
+            return [t.strip() for t in out]
+    except ValueError:
+        pass
+    return None
+
+def _batches(segments: List[str]) -> List[List[str]]:
+    batches: List[List[str]] = []
+    size = 0
+    for s in segments:
+        if batches and size + len(s) <= TRANSLATE_BATCH_CHARS:
+            batches[-1].append(s)
+            size += len(s)
+        else:
+            batches.append([s])
+            size = len(s)
+    return batches
+
+
+async def translate_segments(segments: List[str], target_language: str, refresh: bool = False,
+                             single_batch: bool = False) -> List[str]:
+    """
+    Translate each segment (whitespace-only ones pass through), using and filling
+    the translation memory. single_batch sends every miss in one call.
+    """
+    language = normalize_language(target_language)
+    cores: List[Tuple[str, str, str]] = [_EDGE_WS.match(s).groups() for s in segments]
+    unique = list(dict.fromkeys(core for _, core, _ in cores if core))
+    keys = {core: _segment_key(core) for core in unique}
+
+    memory = {} if refresh else await run_in_threadpool(_load_memory, list(keys.values()), language)
+    done: Dict[str, str] = {core: memory[keys[core]] for core in unique if keys[core] in memory}
+    missing = [core for core in unique if core not in done]
+
+    sem = asyncio.Semaphore(TRANSLATE_MAX_INFLIGHT)
+
+    async def run_one(segment: str) -> str:
+        async with sem:
+            return await _translate_one(segment, target_language)
+
+    async def run(batch: List[str]) -> List[str]:
+        async with sem:
+            out = await _translate_batch(batch, target_language)
+        if out is None:
+            # the model merged or dropped items: one call per segment, under the same cap
+            out = list(await asyncio.gather(*(run_one(s) for s in batch)))
+        return out
+
+    batches = [missing] if single_batch and missing else _batches(missing)
+    results = await asyncio.gather(*(run(b) for b in batches))
+    new: Dict[str, str] = {}
+    for batch, translated in zip(batches, results):
+        for core, out in zip(batch, translated):
+            done[core] = out
+            if out:
+                new[keys[core]] = out
+    await run_in_threadpool(_store_memory, new, language)
+
+    return [lead + done[core] + trail if core else lead + trail for lead, core, trail in cores]
+
+async def translate_text(text: str, target_language: str, refresh: bool = False) -> str:
+    pieces = split_segments(text)
+    translated = await translate_segments(pieces[0::2], target_language, refresh=refresh)
+    pieces[0::2] = translated
+    return "".join(pieces).strip()
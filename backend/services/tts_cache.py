@@ -0,0 +1,153 @@
+# backend/services/tts_cache.py
+"""
+Disk cache of synthesized speech.
+
+Key = sha256(text, voice_id, model_id, output_format), so replaying the same
+flashcard or summary with the same voice is served from disk instead of
+ElevenLabs. Audio files live in TTS_CACHE_DIR, kept under TTS_CACHE_MAX_MB by
+evicting the least recently used files (mtime is bumped on every hit), like
+services/extract_cache.py. The output format is part of the file name
+(<key>.<output_format>.audio), so GET /tts/{key} serves the content type of
+the bytes actually stored.
+
+On a miss, tee() passes the provider's chunks through to the client while
+writing them to a .part file, which is moved into place only once the stream
+completed; an interrupted synthesis is never cached.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from typing import Iterator, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "studypal-tts-cache")
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "512"))
+
+_SUFFIX = ".audio"
+_FORMAT = re.compile(r"[a-z0-9_]+")
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def cache_key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+    return hashlib.sha256(json.dumps([text, voice_id, model_id, output_format]).encode("utf-8")).hexdigest()
+
+def is_key(key: str) -> bool:
+    return len(key) == 64 and all(c in "0123456789abcdef" for c in key)
+
+def etag(key: str) -> str:
+    return f'"{key}"'
+
+def media_type(output_format: str) -> str:
+    kind = (output_format or "").split("_", 1)[0]
+    return {
+        "mp3": "audio/mpeg", "opus": "audio/ogg", "wav": "audio/wav",
+        "ulaw": "audio/basic", "alaw": "audio/x-alaw-basic", "pcm": "audio/L16",
+    }.get(kind, "application/octet-stream")
+
+def _path(key: str, output_format: str) -> str:
+    return os.path.join(TTS_CACHE_DIR, key[:2], f"{key}.{output_format}{_SUFFIX}")
+
+def _count(name: str, n: int = 1) -> None:
+    with _LOCK:
+        _STATS[name] += n
+
+def _find(key: str) -> Optional[Tuple[str, str]]:
+    folder = os.path.join(TTS_CACHE_DIR, key[:2])
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return None
+    for name in names:
+        if name.startswith(key + ".") and name.endswith(_SUFFIX):
+            return os.path.join(folder, name), name[len(key) + 1:-len(_SUFFIX)]
+    return None
+
+def get_path(key: str) -> Optional[Tuple[str, str]]:
+    """(path, output_format) of the cached audio for key (marked as recently used), or None."""
+    found = _find(key)
+    try:
+        if found is None:
+            raise FileNotFoundError(key)
+        os.utime(found[0])  # LRU: mark as recently used
+    except OSError:
+        _count("misses")
+        return None
+    _count("hits")
+    return found
+
+def tee(key: str, output_format: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Yield chunks unchanged, storing them under key once the stream has been fully read."""
+    if not _FORMAT.fullmatch(output_format):
+        # not a provider format name: never part of a file name
+        yield from chunks
+        return
+    path = _path(key, output_format)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        out = os.fdopen(fd, "wb")
+    except OSError:
+        # cache not writable: still serve the audio
+        yield from chunks
+        return
+    complete = False
+    try:
+        for chunk in chunks:
+            if chunk:
+                out.write(chunk)
+                yield chunk
+        complete = True
+    finally:
+        out.close()
+        try:
+            if complete:
+                os.replace(tmp, path)
+            else:
+                os.remove(tmp)
+        except OSError:
+            complete = False
+    if complete:
+        _count("stores")
+        _evict()
+
+def _evict() -> None:
+    limit = TTS_CACHE_MAX_MB * 1024 * 1024
+    entries = []
+    total = 0
+    for root, _, files in os.walk(TTS_CACHE_DIR):
+        for name in files:
+            if not name.endswith(_SUFFIX):
+                continue
+            p = os.path.join(root, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+    if total <= limit:
+        return
+    entries.sort()  # oldest first
+    for _, size, p in entries:
+        if total <= limit:
+            break
+        try:
+            os.remove(p)
+        except OSError:
+            continue
+        total -= size
+        _count("evictions")
+
+def stats() -> dict:
+    with _LOCK:
+        out = dict(_STATS)
+    lookups = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else 0.0
+    return out
@@ -0,0 +1,138 @@
+# backend/services/uploads.py
+"""
+Streaming multipart upload handling.
+
+File parts are written straight from the request stream to temp files in the
+chunks the ASGI server hands us, hashed and size-checked as they arrive. A part
+that passes MAX_BYTES (or has an unsupported extension) aborts the request
+right there, before the rest of the body is read, so memory per upload stays
+at one network chunk regardless of file size.
+
+    async with receive_uploads(request) as (fields, uploads):
+        ...  # temp files are deleted when the block exits
+"""
+import hashlib
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from tempfile import NamedTemporaryFile
+from typing import IO, AsyncIterator, Dict, List, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+load_dotenv()
+
+MAX_BYTES = 50 * 1024 * 1024  # 50 MB per file
+MAX_UPLOAD_FILES = int(os.getenv("MAX_UPLOAD_FILES", "20"))
+SUPPORTED_EXTS = (".pdf", ".docx", ".pptx")
+
+
+@dataclass
+class SpooledUpload:
+    field: str
+    filename: str
+    ext: str
+    path: str
+    sha256: str
+    size: int
+
+
+def _too_large(name: str) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"{name} exceeds {MAX_BYTES // (1024*1024)}MB limit")
+
+
+class _StreamingUploadParser(MultiPartParser):
+    """
+    Starlette's parser, but file parts go to named temp files and are hashed/limited on the fly.
+    Hooks into parser internals (_current_part, _files_to_close_on_error), so
+    requirements.txt pins the Starlette range this was tested with.
+    """
+
+    def __init__(self, request: Request) -> None:
+        super().__init__(request.headers, request.stream(), max_files=MAX_UPLOAD_FILES)
+        self.uploads: List[SpooledUpload] = []
+        self._hashers: Dict[int, "hashlib._Hash"] = {}
+        self._temp_files: List[IO[bytes]] = []
+
+    def on_headers_finished(self) -> None:
+        super().on_headers_finished()
+        part = self._current_part
+        if part.file is None:
+            return
+
+        name = part.file.filename or "uploaded"
+        _, ext = os.path.splitext(name.lower())
+        if ext not in SUPPORTED_EXTS:
+            part.file.file.close()
+            raise HTTPException(status_code=415, detail=f"Unsupported file type '{ext}'. Use PDF, DOCX, or PPTX.")
+
+        # swap the in-memory spool Starlette just made for a file on disk
+        self._files_to_close_on_error.remove(part.file.file)
+        part.file.file.close()
+        tmp = NamedTemporaryFile(delete=False, suffix=ext)
+        self._temp_files.append(tmp)
+        self._files_to_close_on_error.append(tmp)
+        part.file.file = tmp
+        self._hashers[id(part)] = hashlib.sha256()
+        self.uploads.append(SpooledUpload(part.field_name, name, ext, tmp.name, "", 0))
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        part = self._current_part
+        if part.file is not None:
+            upload = self.uploads[-1]
+            upload.size += end - start
+            if upload.size > MAX_BYTES:
+                raise _too_large(upload.filename)
+            self._hashers[id(part)].update(data[start:end])
+        super().on_part_data(data, start, end)
+
+    def on_part_end(self) -> None:
+        part = self._current_part
+        if part.file is not None:
+            self.uploads[-1].sha256 = self._hashers.pop(id(part)).hexdigest()
+        super().on_part_end()
+
+    def discard(self) -> None:
+        """Close and delete every temp file; Starlette only closes them itself on some errors."""
+        for f in self._temp_files:
+            try:
+                f.close()
+            except OSError:
+                pass
+        _remove([u.path for u in self.uploads])
+
+
+def _remove(paths: List[str]) -> None:
+    for p in paths:
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+@asynccontextmanager
+async def receive_uploads(request: Request) -> AsyncIterator[Tuple[Dict[str, str], List[SpooledUpload]]]:
+    """Stream a multipart body to disk; yields (text fields, spooled files)."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_UPLOAD_FILES * MAX_BYTES + 1024 * 1024:
+        raise HTTPException(status_code=413, detail="Upload exceeds the request size limit")
+
+    parser = _StreamingUploadParser(request)
+    try:
+        form = await parser.parse()
+    except MultiPartException as e:
+        parser.discard()
+        raise HTTPException(status_code=400, detail=e.message)
+    except BaseException:
+        parser.discard()
+        raise
+
+    fields = {k: v for k, v in form.multi_items() if isinstance(v, str)}
+    try:
+        for _, v in form.multi_items():
+            if not isinstance(v, str):
+                v.file.close()
+        yield fields, parser.uploads
+    finally:
+        parser.discard()
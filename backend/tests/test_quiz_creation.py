@@ -0,0 +1,69 @@
+# backend/tests/test_quiz_creation.py
+"""Every POST /courses/{course_id}/quiz is a new attempt: no response cache, no shared job."""
+import json
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from apis import quiz_api
+from models import Course, Quiz, init_models
+from services import llm_cache
+
+
+def _quiz_json() -> str:
+    questions = [
+        {"type": "mcq", "question": f"Which layer handles concern {i}?",
+         "options": ["Transport", "Network", "Session", "Physical"], "correct_index": i % 4}
+        for i in range(10)
+    ]
+    return json.dumps({"questions": questions})
+
+
+class _FakeResponses:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return type("Response", (), {"output_text": _quiz_json()})()
+
+
+class _FakeClient:
+    def __init__(self):
+        self.responses = _FakeResponses()
+
+
+@pytest.fixture
+def quiz_course(tmp_path, monkeypatch):
+    """A sqlite-backed course for quiz_api, with the model and course excerpts faked."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'quiz.db'}", future=True)
+    init_models(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    monkeypatch.setattr(quiz_api, "_SESSION_FACTORY", SessionLocal)
+    monkeypatch.setattr(llm_cache, "_SESSION_FACTORY", SessionLocal, raising=False)
+    monkeypatch.setattr(quiz_api, "course_context", lambda db, course_id, topic, budget, spread=False: "Layers.")
+    client = _FakeClient()
+    monkeypatch.setattr(quiz_api, "openai_client", lambda: client)
+
+    with SessionLocal() as db:
+        course = Course(course_name="Networks", course_content="Layers.")
+        db.add(course)
+        db.commit()
+        course_id = course.course_id
+    yield SessionLocal, course_id, client
+    engine.dispose()
+
+
+def test_each_quiz_creation_calls_the_model(quiz_course):
+    SessionLocal, course_id, client = quiz_course
+
+    first = quiz_api._create_quiz(course_id, {})
+    second = quiz_api._create_quiz(course_id, {})
+
+    assert first["status"] == "SUCCESS", first
+    assert second["status"] == "SUCCESS", second
+    assert client.responses.calls == 2
+    assert json.loads(first["data"])["quiz_id"] != json.loads(second["data"])["quiz_id"]
+    with SessionLocal() as db:
+        assert db.execute(select(func.count()).select_from(Quiz).where(Quiz.course_id == course_id)).scalar() == 2
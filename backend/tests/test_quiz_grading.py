@@ -0,0 +1,83 @@
+# backend/tests/test_quiz_grading.py
+"""
+POST /quizzes/{quiz_id}/answers grades a submission in a fixed number of
+statements, whatever the number of questions.
+
+Runs on a throwaway sqlite database; with a Postgres DATABASE_URL in the
+environment it runs against that database instead.
+"""
+import json
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from apis import quiz_api
+from bench.quiz_data import answers_for, drop_course, recorded_statements, seed_quizzes
+from models import Quiz, QuizQuestion, init_models
+
+QUESTION_COUNTS = (10, 200)
+
+
+@pytest.fixture
+def graded_quizzes(tmp_path, monkeypatch):
+    """(engine, session factory, {question count: quiz_id}) for a throwaway course."""
+    url = os.getenv("DATABASE_URL", "")
+    if not url.startswith("postgresql"):
+        url = f"sqlite:///{tmp_path / 'grading.db'}"
+    engine = create_engine(url, future=True, pool_pre_ping=True)
+    init_models(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    monkeypatch.setattr(quiz_api, "_SESSION_FACTORY", SessionLocal)
+
+    course_id, quiz_ids = seed_quizzes(SessionLocal, QUESTION_COUNTS, course_name="test-quiz-grading")
+    try:
+        yield engine, SessionLocal, quiz_ids
+    finally:
+        drop_course(SessionLocal, course_id)
+        engine.dispose()
+
+
+def test_statement_count_does_not_grow_with_questions(graded_quizzes):
+    engine, _, quiz_ids = graded_quizzes
+
+    counts = {}
+    for n, quiz_id in quiz_ids.items():
+        with recorded_statements(engine) as statements:
+            result = quiz_api.submit_quiz_answers(quiz_id, answers_for(n))
+        assert result["status"] == "SUCCESS", result
+        counts[n] = len(statements)
+
+    # one bulk UPDATE of the answers, one UPDATE of the quiz
+    assert counts == {n: 2 for n in QUESTION_COUNTS}
+
+
+def test_grading_result(graded_quizzes):
+    _, SessionLocal, quiz_ids = graded_quizzes
+    quiz_id = quiz_ids[10]
+    answers = answers_for(10) + [{"question_index": 99, "student_selected_index": 0}]
+
+    result = quiz_api.submit_quiz_answers(quiz_id, answers)
+
+    assert result["status"] == "SUCCESS", result
+    assert json.loads(result["data"]) == {
+        "quiz_id": quiz_id,
+        "updated": 10,
+        "missing_questions": [99],
+        "correct_count": 5,
+        "is_submitted": True,
+    }
+    with SessionLocal() as db:
+        quiz = db.get(Quiz, quiz_id)
+        assert quiz.is_submitted and quiz.correct_count == 5
+        selected = {q.question_index: q.student_selected_index
+                    for q in db.query(QuizQuestion).filter(QuizQuestion.quiz_id == quiz_id)}
+    assert selected == {a["question_index"]: a["student_selected_index"] for a in answers_for(10)}
+
+
+def test_unknown_quiz_fails(graded_quizzes):
+    result = quiz_api.submit_quiz_answers(987654, answers_for(1))
+
+    assert result["status"] == "FAIL"
+    assert "not found" in result["message"]
@@ -0,0 +1,31 @@
+# backend/tests/test_speech_segments.py
+from services import speech
+from services.speech import TTS_FIRST_SEGMENT_CHARS, TTS_SEGMENT_CHARS, split_segments
+
+
+def test_long_first_sentence_only_opening_piece_is_short():
+    text = " ".join(["word"] * 800)  # 3999 chars, no sentence boundary
+
+    segments = split_segments(text)
+
+    assert len(segments[0]) <= TTS_FIRST_SEGMENT_CHARS
+    assert all(len(s) <= TTS_SEGMENT_CHARS for s in segments[1:])
+    # 300 + 1500 + 1500 + ~700, not fourteen 300-char pieces
+    assert len(segments) == 4
+    assert " ".join(segments) == text
+
+
+def test_sentences_are_packed_up_to_the_segment_size():
+    sentence = "This sentence is exactly forty chars ok."
+    text = " ".join([sentence] * 100)
+
+    segments = split_segments(text)
+
+    assert len(segments[0]) <= TTS_FIRST_SEGMENT_CHARS
+    assert all(TTS_SEGMENT_CHARS - len(sentence) <= len(s) <= TTS_SEGMENT_CHARS for s in segments[1:-1])
+    assert " ".join(segments) == text
+
+
+def test_wav_is_not_split():
+    assert speech.max_chars("wav_44100") == TTS_SEGMENT_CHARS
+    assert speech.max_chars("mp3_44100_128") == speech.TTS_MAX_CHARS
@@ -9,17 +9,22 @@ function Chatbot() {
   const [chat, setChat] = useState([]);
   const [loading, setLoading] = useState(false);
   const [uploadMessage, setUploadMessage] = useState("");
+  const [docId, setDocId] = useState(null);
+  const [chatSessionId, setChatSessionId] = useState(null);
   const chatEndRef = useRef(null);
 
    const { userId } = useParams();
    const navigate = useNavigate();
 
-  // Convert chat to Gemini API format
-  const toGeminiHistory = () =>
-    chat.map((m) => ({
-      role: m.role === "You" ? "user" : "model",
-      parts: [m.text],
-    }));
+  // Server-side conversation: history stays on the server, we only send the new message
+  const ensureChatSession = async () => {
+    if (chatSessionId) return chatSessionId;
+    const res = await axios.post(`http://localhost:8000/chat/sessions`, {
+      user_id: Number(userId) || null,
+    });
+    setChatSessionId(res.data.chat_session_id);
+    return res.data.chat_session_id;
+  };
 
   // Send chat message
   const handleAsk = async () => {
@@ -33,9 +38,12 @@ function Chatbot() {
 
     try {
       // const baseURL = import.meta.env.VITE_API_BASE_URL;
+      const sessionId = await ensureChatSession();
       const res = await axios.post(`http://localhost:8000/chat`, {
         message,
-        history: toGeminiHistory(),
+        chat_session_id: sessionId,
+        doc_id: docId,
+        user_id: Number(userId) || null,
       });
       setChat([...newChat, { role: "Bot", text: res.data.answer }]);
     } catch (error) {
@@ -66,12 +74,14 @@ function Chatbot() {
 
     const formData = new FormData();
     formData.append("file", file);
+    if (userId) formData.append("user_id", String(userId));
     setUploadMessage("📄 Uploading file...");
 
     try {
       const res = await axios.post(`http://localhost:8000/upload_pdf`, formData, {
         headers: { "Content-Type": "multipart/form-data" },
       });
+      if (res.data.doc_id) setDocId(res.data.doc_id);
       setUploadMessage(`✅ ${res.data.message}`);
     } catch (err) {
       console.error(err);
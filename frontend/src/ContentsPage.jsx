@@ -42,6 +42,7 @@ const [fc, setFc] = useState({
 // below existing summary/fc state
 const [past, setPast] = useState({
   items: [],            // [{quiz_id, quiz_title, created_at, correct_count}]
+  nextCursor: null,     // set while older quizzes remain on the server
   loading: false,
   error: ""
 });
@@ -211,18 +212,17 @@ async function translateSummaryTo(lang) {
 
   try {
     setTranslating(true);
-    const res = await fetch(`${API_BASE_URL}/translate`, {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({
-        text: originalSummary || summary.text,
-        target_language: lang,
-      }),
-    });
+    // stored server-side: translated once per course, length and language
+    const url = `${API_BASE_URL}/courses/${encodeURIComponent(courseId)}/summary/translation` +
+      `?summary_length=${encodeURIComponent(summary.length)}&language=${encodeURIComponent(lang)}`;
+    const res = await fetch(url);
     if (!res.ok) throw new Error(`HTTP ${res.status}`);
-    const json = await res.json(); // { language, translated_text }
-    setTranslatedCache((c) => ({ ...c, [lang]: json.translated_text }));
-    setSummary((s) => ({ ...s, text: json.translated_text }));
+    const json = await res.json();
+    if (json.status !== "SUCCESS") throw new Error(json.message);
+    const data = typeof json.data === "string" ? JSON.parse(json.data) : json.data;
+    const translated = sanitizeSummary(data.summary_content || "");
+    setTranslatedCache((c) => ({ ...c, [lang]: translated }));
+    setSummary((s) => ({ ...s, text: translated }));
   } catch (e) {
     alert("Could not translate. Please try again.");
     // fallback: keep whatever was there
@@ -238,7 +238,9 @@ async function generateSummary() {
   setSummary((s) => ({ ...s, error: "" }));
   setGenerating(true);
   try {
-    const res = await fetch(`${API_BASE_URL}/courses/${encodeURIComponent(courseId)}/summary`, {
+    // regenerating a shown summary must skip the server's LLM response cache
+    const regenerate = summary.text ? "?regenerate=true" : "";
+    const res = await fetch(`${API_BASE_URL}/courses/${encodeURIComponent(courseId)}/summary${regenerate}`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ summary_length: summary.length }),
@@ -281,7 +283,9 @@ async function generateFlashcards() {
   if (!courseId) return;
   setFc((s) => ({ ...s, generating: true, error: "" }));
   try {
-    const res = await fetch(`${API_BASE_URL}/courses/${encodeURIComponent(courseId)}/flashcards`, {
+    // regenerating an existing set must skip the server's LLM response cache
+    const regenerate = fc.items.length > 0 ? "?regenerate=true" : "";
+    const res = await fetch(`${API_BASE_URL}/courses/${encodeURIComponent(courseId)}/flashcards${regenerate}`, {
       method: "POST",
     });
     if (!res.ok) throw new Error(`HTTP ${res.status}`);
@@ -293,11 +297,12 @@ async function generateFlashcards() {
 }
 
 
-async function fetchPastQuizzes() {
+async function fetchPastQuizzes(cursor = null) {
   if (!courseId) return;
   setPast((s) => ({ ...s, loading: true, error: "" }));
   try {
-    const res = await fetch(`${API_BASE_URL}/courses/${encodeURIComponent(courseId)}/quizzes`);
+    const page = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+    const res = await fetch(`${API_BASE_URL}/courses/${encodeURIComponent(courseId)}/quizzes${page}`);
     if (!res.ok) throw new Error(`HTTP ${res.status}`);
     const json = await res.json();
     const payload = parseMaybeJson(json.data) || {};
@@ -307,7 +312,12 @@ async function fetchPastQuizzes() {
       created_at: q.created_at,          
       correct_count: q.correct_count ?? null
     }));
-    setPast({ items, loading: false, error: "" });
+    setPast((s) => ({
+      items: cursor ? [...s.items, ...items] : items,
+      nextCursor: payload.next_cursor || null,
+      loading: false,
+      error: ""
+    }));
   } catch (e) {
     setPast((s) => ({ ...s, loading: false, error: "Could not fetch past quizzes." }));
   }
@@ -1221,6 +1231,15 @@ useEffect(() => {
                   </div>
                 </div>
               ))}
+
+              {!past.loading && !past.error && past.nextCursor && (
+                <button
+                  onClick={() => fetchPastQuizzes(past.nextCursor)}
+                  style={{ alignSelf: "center", background: "none", color: "#2563eb", border: "1px solid #2563eb",
+                          borderRadius: 6, padding: "6px 12px", cursor: "pointer" }}>
+                  Load older quizzes
+                </button>
+              )}
             </div>
           )}
 